@@ -1,6 +1,22 @@
+import time
+
+# Taken before anything else is imported so --startup-time covers the imports.
+START_TIME = time.time()
+
 from corn_app import feature
 from corn_app import csv_features
+from corn_app import feature_store
 from corn_app import trainer
+from corn_app import parallel
+from corn_app import pipeline
+from corn_app import cache
+from corn_app import resolution
+from corn_app import profiler
+from corn_app import export
+from corn_app import predictor
+from corn_app import server
+from corn_app import sweep
+from corn_app import evaluate
 import argparse
 import collections
 import os
@@ -8,8 +24,11 @@ import cv2
 import json
 import sys
 import csv
+import glob
 import re
-import time
+
+# Modules too slow to import unless the selected command needs them.
+HEAVY_MODULES = ('tensorflow', 'skimage', 'scipy')
 
 json_data = ""
 photo_dir = ""
@@ -17,6 +36,10 @@ output_dir = ""
 
 SUPPORTED_EXTS = ('.JPG', 'jpg')
 
+# Extensions --path accepts, compared in lower case.
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+LIST_EXTS  = ('.txt',)
+
 def natural_sort(l):
     """Used to sort the filenames numerically without leading zeros
 
@@ -30,40 +53,183 @@ def natural_sort(l):
     return sorted(l, key = alphanum_key)
 
 
-def features_process(output_path):
-    """Processes a photo and prepares it for the TensorFlow code.
+def load_config():
+    """Reads config.json the first time a command needs a photo directory.
+    """
+    global json_data, photo_dir, output_dir
+
+    if json_data:
+        return
+
+    try:
+        json_data = json.load(open('config.json'))
+    except IOError:
+        print('There was an error opening the \'config.json\' file, or it does not exist. Please create one in a similar structure to \'sample_config.json\'')
+        sys.exit(1)
+
+    photo_dir  = json_data['cornPhotoDir']
+    output_dir = json_data['contourPhotoDir']
+
+
+def list_photos():
+    """Lists the supported photos in photo_dir from lowest corn id to highest.
+
+    :return:
+        Returns a list of paths to the photos
+    """
+    load_config()
+    image_files = []
+
+    for file in natural_sort(os.listdir(photo_dir)):
+        if file.endswith(SUPPORTED_EXTS):
+            image_files.append(os.path.join(photo_dir, file))
+        else:
+            print(f'{file} is not a supported image format')
+
+    return image_files
+
+
+def has_ext(path, extensions):
+    """True if the path ends with one of the lower case extensions, in any case"""
+    return os.path.splitext(path)[1].lower() in extensions
+
+
+def resolve_images(path):
+    """Expands the --path of the count command into the images it names.
+
+    :param
+        path: An image, a directory of images, a glob pattern or a .txt file listing one image path per line.
+    :return:
+        Returns a list of paths to the images
+    """
+    if os.path.isdir(path):
+        files = [file for file in os.listdir(path) if has_ext(file, IMAGE_EXTS)]
+        return [os.path.join(path, file) for file in natural_sort(files)]
+
+    # Existing files are checked first, so names containing [ are not globbed.
+    if os.path.isfile(path):
+        if not has_ext(path, LIST_EXTS):
+            return [path]
+
+        with open(path, 'r') as list_file:
+            return [line.strip() for line in list_file if line.strip()]
+
+    if glob.has_magic(path):
+        return natural_sort(glob.glob(path))
+
+    return [path]
+
+
+def extract_photos(image_files, output_path, workers=parallel.DEFAULT_WORKERS, pipelined=False, feature_cache=None, long_edge=None, trace_sink=None, mask_cache=None, tile_size=None):
+    """Picks the extraction strategy selected on the command line.
+
+    :return:
+        Returns an iterator over the features of each photo, in the order of image_files
+    """
+    if pipelined:
+        extractor = lambda paths: pipeline.extract_all(paths, 'otsu', output_path, long_edge=long_edge, trace_sink=trace_sink, mask_cache=mask_cache, tile_size=tile_size)
+    else:
+        extractor = lambda paths: parallel.extract_all(paths, 'otsu', output_path, workers, long_edge, trace_sink, mask_cache, tile_size)
+
+    if mask_cache is not None:
+        masked_extractor = extractor
+        extractor        = lambda paths: cache.evict_after(masked_extractor(paths), mask_cache)
+
+    if feature_cache is not None:
+        return cache.extract_all(image_files, 'otsu', output_path, extractor, feature_cache, long_edge)
+
+    return extractor(image_files)
+
+
+def count_process(image_files, model_name, output_path, workers=parallel.DEFAULT_WORKERS, pipelined=False, feature_cache=None, long_edge=None, mask_cache=None, tile_size=None):
+    """Predicts the full kernel count of many photos with a single model load.
 
     :param
-        counting_method: The counting method used to obtain the front-facing kernel count. Currently, this is fixed to the 'otsu' method.
+        image_files: Paths to the photos to count.
     :param
-        export_flag: A true or false flag stating if the user would like the photos exported or not.
+        model_name: Name of the model used for the predictions.
+    :return:
+        Returns the path of the csv file the predictions were written to
     """
-    # Open csv file that the features will be written to
-    with open(csv_features.FILENAME, 'w') as csvfile:
-        feature_writer = csv.writer(csvfile, delimiter=csv_features.DELIM, quotechar=csv_features.QUOTECHAR, quoting=csv.QUOTE_MINIMAL)
-        feature_writer.writerow(csv_features.HEADER)
+    model       = trainer.load_model(model_name)
+    file_count  = len(image_files)
+    start_time  = time.time()
+    features    = []
 
+    print(f'Counting {file_count} images')
+    results = extract_photos(image_files, output_path, workers, pipelined, feature_cache, long_edge, mask_cache=mask_cache, tile_size=tile_size)
+    for current_file_num, ear_features in enumerate(results, 1):
+        print('{0:30}   {1}/{2}'.format(ear_features.filename[0:20], current_file_num, file_count ))
+        features.append(ear_features)
+
+    counts          = model.predict(features)
+    prediction_file = predictor.PREDICTIONS_FILENAME.format(model_name=model_name)
+
+    with open(prediction_file, 'w') as csvfile:
+        prediction_writer = csv.writer(csvfile, delimiter=',', quotechar='/', quoting=csv.QUOTE_MINIMAL)
+        prediction_writer.writerow(predictor.PREDICTIONS_HEADER)
+        for ear_features, count in zip(features, counts):
+            prediction_writer.writerow(ear_features.to_list() + [count])
+
+    if isinstance(output_path, export.ExportWriter):
+        output_path.flush()
+
+    elapsed_time = time.time() - start_time
+    throughput   = file_count / elapsed_time if elapsed_time > 0 else 0.0
+    print(f'Counted {file_count} images in {elapsed_time:.2f}s ({throughput:.2f} images/s)')
+
+    return prediction_file
+
+
+def features_process(output_path, workers=parallel.DEFAULT_WORKERS, pipelined=False, feature_cache=None, long_edge=None, run_profiler=None, export_csv=False, mask_cache=None, tile_size=None):
+    """Processes a photo and prepares it for the TensorFlow code.
+
+    :param
+        output_path: Directory or ExportWriter the processed photos are exported to, or None to skip exporting.
+    :param
+        workers: Number of worker processes the photos are spread across.
+    :param
+        pipelined: Runs the decode, mask, contour, count and export stages concurrently instead of using worker processes.
+    :param
+        feature_cache: Optional FeatureCache whose entries are reused for photos that have not changed.
+    :param
+        long_edge: Long edge in pixels the photos are processed at, or None for full resolution.
+    :param
+        run_profiler: Optional Profiler recording the time each photo spends in each stage.
+    :param
+        export_csv: Also writes the features to the csv file once the feature store is written.
+    :param
+        mask_cache: Optional MaskCache whose masked images are reused for photos that have not changed.
+    :param
+        tile_size: Optional tile size in pixels the photos are masked and thresholded in, bounding their memory.
+    """
+    # Open the feature store that the features will be written to
+    with feature_store.FeatureStoreWriter() as store_writer:
         # Process ears from lowest corn id to highest.
-        sorted_photos     = natural_sort(os.listdir(photo_dir))
+        image_files       = list_photos()
 
         # Gather progress data for the user.
-        file_count        = len(sorted_photos)
-        current_file_num  = 0
+        file_count        = len(image_files)
         start_time        = time.time();
 
+        trace_sink        = run_profiler.record if run_profiler else None
+
         print('Begin processing images')
-        for file in sorted_photos:
-            current_file_num += 1
-            if file.endswith(SUPPORTED_EXTS):
-                # Print current file and current file position of all files to console.
-                print('{0:30}   {1}/{2}'.format(file[0:20], current_file_num, file_count ))
-
-                # Extract features from image and write to feature file.
-                file_path = os.path.join(photo_dir, file)
-                features  = feature.extract_features(file_path, 'otsu', output_path)
-                feature_writer.writerow(features.to_list())
+        results = extract_photos(image_files, output_path, workers, pipelined, feature_cache, long_edge, trace_sink, mask_cache, tile_size)
+
+        for current_file_num, features in enumerate(results, 1):
+            # Print current file and current file position of all files to console.
+            if run_profiler:
+                print('{0:30}   {1}/{2}   {3}'.format(features.filename[0:20], current_file_num, file_count, run_profiler.progress(current_file_num, file_count)))
             else:
-                print(f'{file} is not a supported image format')
+                print('{0:30}   {1}/{2}'.format(features.filename[0:20], current_file_num, file_count ))
+
+            # Write the extracted features to the feature store.
+            store_writer.append(features)
+
+        # Wait for the exported photos to reach the disk.
+        if isinstance(output_path, export.ExportWriter):
+            output_path.flush()
 
         # Display time taken for processing.
         elapsed_time = time.time() - start_time
@@ -71,30 +237,67 @@ def features_process(output_path):
         h, m = divmod(m, 60)
         print ("{0:d}h:{1:d}m:{2:.2f}s".format(int(h),int(m),s))
 
+        if run_profiler:
+            run_profiler.close()
+            print(run_profiler.summary())
+
+    if export_csv:
+        feature_store.export_csv(feature_store.load())
+        print(f'Features written to {csv_features.FILENAME}')
+
 def main(args):
     """Executes and controls the flow of the program
 
     :param
         args: The argparse arguments passed into the command line by the user.
     """
-    output_path = None
+    output_path   = None
+    feature_cache = None
+
+    # Evaluation, cross-validation and serving use every CPU unless told
+    # otherwise, the other commands one.
+    requested_workers = args.workers
+    if args.workers is None:
+        args.workers = parallel.DEFAULT_WORKERS
+    mask_cache    = None
+    run_profiler  = None
+
+    if args.startup_time is True:
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        print(f'Started in {time.time() - START_TIME:.3f}s, heavy modules loaded: {", ".join(loaded) or "none"}')
 
     if args.export is True:
-        output_path = output_dir
+        load_config()
+        output_path = export.ExportWriter(output_dir, args.export_format, args.jpeg_quality,
+                                          args.png_compression, args.preview_scale)
+
+    if args.cache is True:
+        feature_cache = cache.FeatureCache(max_bytes=args.cache_size * 1024 * 1024)
+
+    if args.mask_cache is True:
+        mask_cache = cache.MaskCache(max_bytes=args.mask_cache_size * 1024 * 1024)
+
+    if args.profile is not None:
+        run_profiler = profiler.Profiler(args.profile)
+
+    # Only least squares can be solved again from the saved statistics.
+    if args.incremental is True and args.solver != 'lstsq':
+        print(f'--incremental needs the lstsq solver, not {args.solver}.')
+        exit(-1)
 
     if args.all is True:
         if args.modelname is None:
             print('A name for the new model is needed.')
             exit(0)
 
-        features_process(output_path)
+        features_process(output_path, args.workers, args.pipeline, feature_cache, args.long_edge, run_profiler, args.csv, mask_cache, args.tile_size)
         trainer.generate_training_set(args.modelname)
-        trainer.train(args.modelname)
+        trainer.train(args.modelname, args.solver, args.incremental)
         print(f'Model {args.modelname} trained.')
         exit(0)
 
     if args.features is True:
-        features_process(output_path)
+        features_process(output_path, args.workers, args.pipeline, feature_cache, args.long_edge, run_profiler, args.csv, mask_cache, args.tile_size)
 
     if args.data is True:
         if args.modelname is None:
@@ -109,10 +312,105 @@ def main(args):
             print('A name for the new model is needed.')
             exit(0)
 
-        trainer.train(args.modelname)
+        trainer.train(args.modelname, args.solver, args.incremental)
         print(f'Model {args.modelname} trained.')
         exit(0)
 
+    if args.cross_validate is True:
+        if args.modelname is None:
+            print('A name is needed for the model to cross-validate.')
+            exit(0)
+
+        results = trainer.cross_validate(args.modelname, args.folds, workers=requested_workers)
+
+        print('{0:>8} {1:>8}   {2:66} {3}'.format('MAE', 'MAPE', 'configuration', 'fold MAE'))
+        for result in results:
+            config = json.dumps(dict(solver=result.solver, **result.params))
+            folds  = ' '.join('{0:.2f}'.format(mae) for mae in result.fold_mae)
+            print('{0:>8.2f} {1:>7.2f}%   {2:66} {3}'.format(result.mae, result.mape, config, folds))
+
+        best = results[0]
+        trainer.train(args.modelname, best.solver, solver_params=best.params)
+        print(f'Model {args.modelname} trained with {best.solver} {json.dumps(best.params)}.')
+        exit(0)
+
+    if args.export_weights is True:
+        if args.modelname is None:
+            print('A name is needed for the model to export.')
+            exit(0)
+
+        trainer.export_weights(args.modelname)
+        print(f'Weights of model {args.modelname} exported.')
+        exit(0)
+
+    if args.drift_report is not None:
+        long_edges = [int(long_edge) for long_edge in args.drift_report.split(',')]
+        summaries  = resolution.drift_report(list_photos(), 'otsu', long_edges)
+
+        print('{0:>10} {1:>18} {2:>17} {3:>18} {4:>8}'.format('long edge', 'mean count drift', 'max count drift', 'mean ratio drift', 'speedup'))
+        for summary in summaries:
+            print('{0:>10} {1:>17.2f}% {2:>16.2f}% {3:>17.2f}% {4:>7.2f}x'.format(*summary))
+        print(f'Drift report written to {resolution.FILENAME}')
+        exit(0)
+
+    if args.evaluate is not None:
+        if args.modelname is None:
+            print('A name is needed for the model to evaluate.')
+            exit(0)
+
+        errors, summary = evaluate.evaluate(resolve_images(args.evaluate), args.modelname, requested_workers,
+                                            long_edge=args.long_edge)
+        report_file     = evaluate.FILENAME.format(model_name=args.modelname)
+        evaluate.write_report(errors, report_file)
+
+        for error in errors:
+            print('{0:30} {1:>6} {2:>6} {3:>7.2f}%'.format(error.filename[0:30], error.predicted, error.actual, error.percent_error))
+        if summary.unmatched:
+            print(f'No full kernel count for: {", ".join(summary.unmatched)}')
+        if summary.images == 0:
+            print('No photos with a full kernel count to evaluate.')
+            exit(-1)
+
+        print(f'{summary.images} images in {summary.seconds:.2f}s ({summary.images_per_second:.2f} images/s)')
+        print(f'MAE {summary.mae:.2f}, MAPE {summary.mape:.2f}%, worst {summary.max_percent_error:.2f}%')
+        print(f'Evaluation written to {report_file}')
+
+        passed = True
+        if args.max_error is not None and summary.max_percent_error > args.max_error:
+            print(f'FAILED: an image is off by more than {args.max_error}%.')
+            passed = False
+        if args.max_mape is not None and summary.mape > args.max_mape:
+            print(f'FAILED: MAPE is above {args.max_mape}%.')
+            passed = False
+        if args.min_speed is not None and summary.images_per_second < args.min_speed:
+            print(f'FAILED: fewer than {args.min_speed} images/s.')
+            passed = False
+        exit(0 if passed else -1)
+
+    if args.sweep is not None:
+        try:
+            grid = sweep.load_grid(args.sweep)
+        except (IOError, ValueError) as e:
+            print(e)
+            exit(-1)
+
+        scores = sweep.run(list_photos(), grid, args.workers, args.long_edge)
+
+        print('{0:>8} {1:>8} {2:>8} {3:>8}   {4}'.format('MAE', 'MAPE', 'ears', 'failed', 'configuration'))
+        for score in scores[:5]:
+            if score.mae is not None:
+                print('{0:>8.2f} {1:>7.2f}% {2:>8} {3:>8}   {4}'.format(score.mae, score.mape, score.ears, score.failures, json.dumps(score.config)))
+        print(f'Sweep results written to {sweep.FILENAME}')
+        exit(0)
+
+    if args.serve is True:
+        if args.modelname is None:
+            print('A name is needed for the model to serve.')
+            exit(0)
+
+        server.serve(args.modelname, 'otsu', args.host, args.port, args.socket, requested_workers, args.long_edge)
+        exit(0)
+
     if args.count is True:
         if args.path is None:
             print('A file path is needed to count an image.')
@@ -122,34 +420,72 @@ def main(args):
             print('A name is needed for the model to use.')
             exit(0)
 
-        print('Processing image.')
-        features = feature.extract_features(args.path, 'otsu', output_path)
-        count    = trainer.get_count(args.modelname, features)
-        print(f'The predicted kernel count is: {count}\n')
+        image_files = resolve_images(args.path)
+
+        if len(image_files) == 1 and image_files[0] == args.path:
+            print('Processing image.')
+            features = feature.extract_features(args.path, 'otsu', output_path, args.long_edge, mask_cache=mask_cache, tile_size=args.tile_size)
+            count    = trainer.get_count(args.modelname, features)
+            print(f'The predicted kernel count is: {count}\n')
+        else:
+            prediction_file = count_process(image_files, args.modelname, output_path, args.workers,
+                                            args.pipeline, feature_cache, args.long_edge, mask_cache, args.tile_size)
+            print(f'Predictions written to {prediction_file}')
+
+        if output_path is not None:
+            output_path.close()
         exit(0)
 
 
-parser = argparse.ArgumentParser(description='A command line tool written in Python that processes the corn photos and prepares them for TensorFlow.', prog='Corn Kernel Counter Prep Application')
-parser.add_argument('--version', action='version', version='Version 1.1.0')
-parser.add_argument('-e', '--export',   action='store_true', default=False, help='Exports the photos after they are processed.')
-parser.add_argument('-a', '--all',      action='store_true', help='Processes photos, creates the data set for a model and trains said model on the data set.')
-parser.add_argument('-d', '--data',     action='store_true', default=False, help='Creates the data.csv file for training.')
-parser.add_argument('-t', '--train',    action='store_true', default=False, help='Trains model from dataset.csv file')
-parser.add_argument('-c', '--count',    action='store_true', default=False, help='gets_count')
-parser.add_argument('-f', '--features', action='store_true', default=False, help='Applies a mask then draws the contours on a masked image.')
-parser.add_argument('-m', '--modelname', action='store', help='Used to pass in the name of the model being trained.')
-parser.add_argument('-p', '--path',      action='store', help='File path to an image.')
+def build_parser():
+    """Builds the command line parser.
 
-args = parser.parse_args()
+    :return:
+        Returns the argparse parser
+    """
+    parser = argparse.ArgumentParser(description='A command line tool written in Python that processes the corn photos and prepares them for TensorFlow.', prog='Corn Kernel Counter Prep Application')
+    parser.add_argument('--version', action='version', version='Version 1.1.0')
+    parser.add_argument('-e', '--export',   action='store_true', default=False, help='Exports the photos after they are processed.')
+    parser.add_argument('-a', '--all',      action='store_true', help='Processes photos, creates the data set for a model and trains said model on the data set.')
+    parser.add_argument('-d', '--data',     action='store_true', default=False, help='Creates the data.csv file for training.')
+    parser.add_argument('-t', '--train',    action='store_true', default=False, help='Trains model from dataset.csv file')
+    parser.add_argument('-c', '--count',    action='store_true', default=False, help='gets_count')
+    parser.add_argument('-f', '--features', action='store_true', default=False, help='Applies a mask then draws the contours on a masked image.')
+    parser.add_argument('-m', '--modelname', action='store', help='Used to pass in the name of the model being trained.')
+    parser.add_argument('-p', '--path',      action='store', help='File path to an image. Counting also accepts a directory, a glob pattern or a .txt file listing one image per line.')
+    parser.add_argument('-w', '--workers',   action='store', type=int, help=f'Number of processes used to extract features in parallel. Defaults to {parallel.DEFAULT_WORKERS}, or one per CPU when evaluating, cross-validating or serving.')
+    parser.add_argument('--pipeline',        action='store_true', default=False, help='Streams photos through concurrent decode, mask, contour, count and export stages.')
+    parser.add_argument('--cache',           action='store_true', default=False, help='Reuses the features of photos that have not changed since the last run.')
+    parser.add_argument('--cache-size',      action='store', type=int, default=cache.MAX_BYTES // (1024 * 1024), help='Size in MB the feature cache is trimmed back to.')
+    parser.add_argument('--csv',             action='store_true', default=False, help=f'Also writes the extracted features to {csv_features.FILENAME}.')
+    parser.add_argument('--mask-cache',      action='store_true', default=False, help='Reuses the masked images of photos that have not changed, skipping decoding and masking.')
+    parser.add_argument('--mask-cache-size', action='store', type=int, default=cache.MASK_MAX_BYTES // (1024 * 1024), help='Size in MB the mask cache is trimmed back to.')
+    parser.add_argument('--solver',          action='store', choices=list(trainer.SOLVERS), default='lstsq', help='Method used to fit the model while training.')
+    parser.add_argument('--incremental',     action='store_true', default=False, help='Folds only the data set rows added since the model was last trained into it. Needs the lstsq solver.')
+    parser.add_argument('--cross-validate',  action='store_true', default=False, help='Compares solvers and learning rates by k-fold cross-validation on the data set of -m, then trains the model with the best one.')
+    parser.add_argument('--folds',           action='store', type=int, default=trainer.FOLDS, help='Number of folds used to cross-validate, at least 2.')
+    parser.add_argument('--export-weights',  action='store_true', default=False, help='Exports the weights of a trained model so counting does not need TensorFlow.')
+    parser.add_argument('--long-edge',       action='store', type=int, default=feature.WORKING_LONG_EDGE, help='Downsamples photos to this long edge in pixels before processing them.')
+    parser.add_argument('--tile-size',       action='store', type=int, help='Masks and thresholds photos in overlapping tiles of this many pixels. Only the intermediate images are tile sized, the decoded photo and its mask and threshold are still held at full size, so peak memory stays a few times the photo size.')
+    parser.add_argument('--drift-report',    action='store', help='Comma separated long edges to compare against full resolution, e.g. 800,1600.')
+    parser.add_argument('--startup-time',    action='store_true', default=False, help='Prints how long the application took to start.')
+    parser.add_argument('--export-format',   action='store', choices=list(export.FORMATS), help='Image format of the exported photos. Keeps the original format when omitted.')
+    parser.add_argument('--jpeg-quality',    action='store', type=int, default=export.JPEG_QUALITY, help='JPEG quality of the exported photos, 0 to 100.')
+    parser.add_argument('--png-compression', action='store', type=int, default=export.PNG_COMPRESSION, help='PNG compression level of the exported photos, 0 to 9.')
+    parser.add_argument('--preview-scale',   action='store', type=float, help='Exports downscaled previews, e.g. 0.25 for a quarter of the size.')
+    parser.add_argument('--evaluate',        action='store', help='Scores the model given with -m on a directory, glob or list file of hold-out photos.')
+    parser.add_argument('--max-error',       action='store', type=float, help='Fails the evaluation if any photo is off by more than this percent.')
+    parser.add_argument('--max-mape',        action='store', type=float, help='Fails the evaluation if the mean absolute percent error is above this percent.')
+    parser.add_argument('--min-speed',       action='store', type=float, help='Fails the evaluation if fewer images than this are scored per second.')
+    parser.add_argument('--sweep',           action='store', help='JSON file of parameter values to try. Reports the count error of every combination.')
+    parser.add_argument('--serve',           action='store_true', default=False, help='Serves kernel counts over HTTP, keeping the model and pipeline loaded between requests.')
+    parser.add_argument('--host',            action='store', default=server.HOST, help='Address the server listens on.')
+    parser.add_argument('--port',            action='store', type=int, default=server.PORT, help='Port the server listens on.')
+    parser.add_argument('--socket',          action='store', help='Unix socket the server listens on instead of a host and port.')
+    parser.add_argument('--profile',         action='store', nargs='?', const=profiler.TRACE_FILENAME, help=f'Writes per-photo, per-stage timings to a JSONL trace ({profiler.TRACE_FILENAME} by default) and prints a summary.')
 
-try:
-    json_data = json.load(open('config.json'))
-except IOError:
-    print('There was an error opening the \'config.json\' file, or it does not exist. Please create one in a similar structure to \'sample_config.json\'')
-    sys.exit(1)
+    return parser
 
-photo_dir  = json_data['cornPhotoDir']
-output_dir = json_data['contourPhotoDir']
 
 if __name__ == '__main__':
-    main(args)
+    main(build_parser().parse_args())
@@ -0,0 +1,211 @@
+"""Times each stage of the kernel counting pipeline on synthetic ears
+
+Run with ``python -m corn_app.benchmark``. The results are written as JSON so
+two runs, e.g. before and after a change, can be compared with --compare.
+
+Attributes:
+    RESOLUTIONS (list(tuple)): Default image sizes the image stages are timed at
+    REPEATS (int): Default number of timed runs of each stage
+    DATASET_ROWS (int): Number of ears in the synthetic training data set
+    FORMAT_VERSION (int): Version of the JSON result layout
+"""
+from corn_app import feature
+from corn_app import predictor
+from corn_app import synthetic
+from corn_app import trainer
+import argparse
+import cv2
+import json
+import numpy as np
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+RESOLUTIONS    = [(640, 480), (1280, 960), (2560, 1920)]
+REPEATS        = 3
+DATASET_ROWS   = 210
+FORMAT_VERSION = 1
+
+
+def time_stage(function, make_args, repeats):
+    """Times repeated calls of a stage
+
+    Args:
+        function (function) : The stage to time.
+        make_args (function): Returns a fresh argument tuple for each call, so
+            stages that draw on their input always start from the same image.
+            Its own time is not counted.
+        repeats (int)       : Number of timed calls.
+    Returns:
+        list(float) -- Seconds taken by each call.
+    """
+    timings = []
+    for _ in range(repeats):
+        args       = make_args()
+        start_time = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def stage_result(stage, resolution, timings, **extra):
+    """Packs the timings of a stage into a JSON friendly dict"""
+    result = {
+        'stage':      stage,
+        'resolution': resolution,
+        'repeats':    len(timings),
+        'min_s':      min(timings),
+        'median_s':   statistics.median(timings),
+        'mean_s':     statistics.mean(timings),
+    }
+    result.update(extra)
+    return result
+
+
+def bench_image_stages(width, height, repeats, work_dir):
+    """Times the image stages on a synthetic ear of the given size
+
+    Returns:
+        list(dict) -- One result per stage.
+    """
+    resolution = f'{width}x{height}'
+    ear        = synthetic.synthetic_ear(width, height)
+    masked     = feature.mask_yellow(ear.image)
+    contoured  = feature.find_contours(masked.copy()).image
+
+    file_path = os.path.join(work_dir, f'1_synthetic_{resolution}.png')
+    cv2.imwrite(file_path, ear.image)
+
+    stages = [
+        ('mask_yellow',      feature.mask_yellow,      lambda: (ear.image,)),
+        ('find_contours',    feature.find_contours,    lambda: (masked.copy(),)),
+        ('otsu_method',      feature.otsu_method,      lambda: (contoured.copy(),)),
+        ('watershed_method', feature.watershed_method, lambda: (contoured.copy(),)),
+        ('extract_features', feature.extract_features, lambda: (file_path, 'otsu', None)),
+    ]
+
+    results = []
+    for stage, function, make_args in stages:
+        print(f'Timing {stage} at {resolution}')
+        timings = time_stage(function, make_args, repeats)
+        results.append(stage_result(stage, resolution, timings, pixels=width * height,
+                                    kernel_count=ear.kernel_count))
+    return results
+
+
+def bench_model_stages(repeats, work_dir, rows=DATASET_ROWS):
+    """Times training and prediction on a synthetic data set
+
+    Returns:
+        list(dict) -- One result per stage. A stage that cannot run, e.g.
+            because TensorFlow is missing, is reported with a skipped reason.
+    """
+    random = np.random.RandomState(0)
+    front  = random.randint(80, 200, size=rows)
+    ratio  = random.uniform(0.6, 1.2, size=rows)
+    total  = 4.2 * front + 30 * ratio + random.normal(0, 10, size=rows)
+
+    model_name = 'benchmark'
+    resolution = f'{rows} rows'
+    results    = []
+    cwd        = os.getcwd()
+
+    os.chdir(work_dir)
+    try:
+        os.makedirs('csv', exist_ok=True)
+        os.makedirs(trainer.MODELS_DIR, exist_ok=True)
+        np.savetxt(f'csv/{model_name}_dataset.csv', np.column_stack([front, ratio, total]), delimiter=',')
+
+        print('Timing train')
+        try:
+            timings = time_stage(trainer.train, lambda: (model_name,), repeats)
+            results.append(stage_result('train', resolution, timings))
+        except ImportError as e:
+            results.append({'stage': 'train', 'resolution': resolution, 'skipped': str(e)})
+
+        # Prediction only needs the exported weights, so it is timed even
+        # when training could not write a checkpoint.
+        weight, basis = trainer.least_squares(np.column_stack([front, ratio]), total)
+        predictor.save_weights(model_name, weight, basis)
+        features = feature.Features('1_synthetic.png', int(front[0]), float(ratio[0]))
+
+        print('Timing get_count')
+        timings = time_stage(trainer.get_count, lambda: (model_name, features), repeats)
+        results.append(stage_result('get_count', '1 ear', timings))
+    finally:
+        os.chdir(cwd)
+
+    return results
+
+
+def run(resolutions=RESOLUTIONS, repeats=REPEATS):
+    """Runs every benchmark
+
+    Returns:
+        dict -- The environment and the results of each stage.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for width, height in resolutions:
+            results.extend(bench_image_stages(width, height, repeats, work_dir))
+        results.extend(bench_model_stages(repeats, work_dir))
+
+    return {
+        'format_version': FORMAT_VERSION,
+        'python':         platform.python_version(),
+        'numpy':          np.__version__,
+        'opencv':         cv2.__version__,
+        'machine':        platform.machine(),
+        'results':        results,
+    }
+
+
+def compare(old, new):
+    """Prints the median time of each stage in two runs side by side
+
+    Args:
+        old (dict): Results of the baseline run.
+        new (dict): Results of the run compared against it.
+    """
+    baseline = {(r['stage'], r['resolution']): r for r in old['results'] if 'median_s' in r}
+
+    print('{0:18} {1:>12} {2:>12} {3:>12} {4:>8}'.format('stage', 'resolution', 'old median', 'new median', 'speedup'))
+    for result in new['results']:
+        key = (result['stage'], result['resolution'])
+        if 'median_s' not in result or key not in baseline:
+            continue
+        old_median = baseline[key]['median_s']
+        print('{0:18} {1:>12} {2:>11.4f}s {3:>11.4f}s {4:>7.2f}x'.format(
+            result['stage'], result['resolution'], old_median, result['median_s'],
+            old_median / result['median_s'] if result['median_s'] else 0.0))
+
+
+def parse_resolutions(text):
+    """Parses resolutions written as 640x480,1280x960"""
+    return [tuple(int(size) for size in resolution.split('x')) for resolution in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times each stage of the kernel counting pipeline on synthetic ears.')
+    parser.add_argument('-o', '--output',      action='store', help='File the JSON results are written to. Printed when omitted.')
+    parser.add_argument('-r', '--repeats',     action='store', type=int, default=REPEATS, help='Number of timed runs of each stage.')
+    parser.add_argument('--resolutions',       action='store', type=parse_resolutions, default=RESOLUTIONS, help='Image sizes to time, e.g. 640x480,1280x960.')
+    parser.add_argument('--compare',           action='store', help='JSON results of an earlier run to compare against.')
+    args = parser.parse_args()
+
+    results = run(args.resolutions, args.repeats)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r') as compare_file:
+            compare(json.load(compare_file), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""On-disk caches of extracted features and masked images keyed by image content
+Attributes:
+    CACHE_DIR (str): Directory the cached features are stored in
+    MAX_BYTES (int): Default size the cache is trimmed back to
+    MASK_DIR (str): Directory the cached masked images are stored in
+    MASK_MAX_BYTES (int): Default size the mask cache is trimmed back to
+    CACHE_VERSION (int): Bumped whenever the feature pipeline's output changes
+        so entries written by older code are never reused
+"""
+from corn_app import feature
+import collections
+import hashlib
+import json
+import numpy as np
+import os
+
+CACHE_DIR     = 'cache/features'
+MAX_BYTES     = 64 * 1024 * 1024
+CACHE_VERSION = 4
+
+MASK_DIR       = 'cache/masks'
+MASK_MAX_BYTES = 2048 * 1024 * 1024
+
+READ_CHUNK = 1024 * 1024
+
+roi_tuple = collections.namedtuple('roi_tuple','left top frame_shape')
+
+
+def file_digest(file_path):
+    """Hashes the bytes of a file
+
+    Args:
+        file_path (string): The file to hash.
+    Returns:
+        string -- Hex SHA-1 digest of the file's content.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(READ_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_params(counting_method, long_edge=feature.WORKING_LONG_EDGE):
+    """Collects every setting that changes the features extracted from an image
+
+    Args:
+        counting_method (string): The counting method used.
+        long_edge (int)         : Long edge in pixels images are processed at.
+    Returns:
+        dict -- The pipeline settings.
+    """
+    return {
+        'version':            CACHE_VERSION,
+        'block_size':         feature.BLOCK_SIZE,
+        'lower_bound_yellow': list(feature.LOWER_BOUND_YELLOW),
+        'upper_bound_yellow': list(feature.UPPER_BOUND_YELLOW),
+        'erosion_kernel':     list(feature.EROSION_KERNEL),
+        'mean_shift_radii':   [feature.MEAN_SHIFT_SPATIAL_RADIUS, feature.MEAN_SHIFT_COLOR_RADIUS],
+        'min_peak_distance':  feature.MIN_PEAK_DISTANCE,
+        'roi_margin':         feature.ROI_MARGIN,
+        'counting_method':    counting_method,
+        'long_edge':          long_edge,
+    }
+
+
+def mask_params(long_edge=feature.WORKING_LONG_EDGE):
+    """Collects every setting that changes the masked image of a photo
+
+    Args:
+        long_edge (int): Long edge in pixels images are processed at.
+    Returns:
+        dict -- The masking settings.
+    """
+    return {
+        'version':            CACHE_VERSION,
+        'lower_bound_yellow': list(feature.LOWER_BOUND_YELLOW),
+        'upper_bound_yellow': list(feature.UPPER_BOUND_YELLOW),
+        'erosion_kernel':     list(feature.EROSION_KERNEL),
+        'roi_margin':         feature.ROI_MARGIN,
+        'long_edge':          long_edge,
+    }
+
+
+def content_key(file_path, params):
+    """Hashes the content of a file together with the settings applied to it"""
+    digest = hashlib.sha1(file_digest(file_path).encode('ascii'))
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def evict_lru(directory, max_bytes, extension):
+    """Deletes the least recently used entries of a cache directory until it fits in max_bytes.
+
+    Files sharing a name but not an extension belong to the same entry and
+    are deleted together. Their age is that of the file with the extension.
+    """
+    entries = {}
+    for name in os.listdir(directory):
+        key, ext = os.path.splitext(name)
+        if ext == '.tmp':
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        mtime, size, names = entries.get(key, (0.0, 0, []))
+        if ext == extension:
+            mtime = stat.st_mtime
+        entries[key] = (mtime, size + stat.st_size, names + [name])
+
+    total_bytes = sum(size for _, size, _ in entries.values())
+    for _, size, names in sorted(entries.values()):
+        if total_bytes <= max_bytes:
+            break
+        for name in names:
+            os.remove(os.path.join(directory, name))
+        total_bytes -= size
+
+
+class FeatureCache(object):
+    """Stores the features of each image under a hash of its content and the
+       pipeline settings, evicting the least recently used entries once the
+       cache grows past max_bytes.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file_path, counting_method, long_edge=feature.WORKING_LONG_EDGE):
+        return content_key(file_path, pipeline_params(counting_method, long_edge))
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key, filename):
+        """Looks up cached features.
+
+        Args:
+            key (string)     : Key returned by FeatureCache.key.
+            filename (string): File name given to the returned features.
+        Returns:
+            Features class -- The cached features, or None on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as entry_file:
+                values = json.load(entry_file)
+        except (IOError, ValueError):
+            return None
+
+        # Refresh the access time used for eviction.
+        os.utime(entry_path, None)
+        return feature.Features(filename, *values)
+
+    def put(self, key, features):
+        entry_path = self._entry_path(key)
+        temp_path  = f'{entry_path}.tmp'
+        with open(temp_path, 'w') as entry_file:
+            json.dump(features.to_list()[1:], entry_file)
+        os.replace(temp_path, entry_path)
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits in max_bytes."""
+        evict_lru(self.directory, self.max_bytes, '.json')
+
+
+class MaskCache(object):
+    """Stores the masked and cropped working image of each photo as a .npy file, so later
+       runs that tune the contour or counting stages skip decoding and
+       masking. Entries are memory mapped copy-on-write, so contours can be
+       drawn onto them without touching the file.
+    """
+
+    def __init__(self, directory=MASK_DIR, max_bytes=MASK_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file_path, long_edge=feature.WORKING_LONG_EDGE):
+        return content_key(file_path, mask_params(long_edge))
+
+    def get(self, key):
+        """Looks up a masked image.
+
+        Args:
+            key (string): Key returned by MaskCache.key.
+        Returns:
+            (numpy array, float, roi_tuple) -- The masked image, its scale and
+                where it sits in the working image, or None on a miss.
+        """
+        array_path = os.path.join(self.directory, f'{key}.npy')
+        try:
+            with open(os.path.join(self.directory, f'{key}.json'), 'r') as entry_file:
+                entry = json.load(entry_file)
+            masked_image = np.load(array_path, mmap_mode='c')
+            roi          = roi_tuple(entry['left'], entry['top'], tuple(entry['frame_shape']))
+        except (IOError, ValueError, KeyError):
+            return None
+
+        # Refresh the access time used for eviction.
+        os.utime(array_path, None)
+        return masked_image, entry['scale'], roi
+
+    def put(self, key, masked_image, scale, roi):
+        # The array is written first, so an entry with a scale is complete.
+        array_path = os.path.join(self.directory, f'{key}.npy')
+        with open(f'{array_path}.tmp', 'wb') as array_file:
+            np.save(array_file, masked_image)
+        os.replace(f'{array_path}.tmp', array_path)
+
+        entry_path = os.path.join(self.directory, f'{key}.json')
+        with open(f'{entry_path}.tmp', 'w') as entry_file:
+            json.dump({'scale': scale, 'left': roi.left, 'top': roi.top,
+                       'frame_shape': list(roi.frame_shape)}, entry_file)
+        os.replace(f'{entry_path}.tmp', entry_path)
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits in max_bytes."""
+        evict_lru(self.directory, self.max_bytes, '.npy')
+
+
+def extract_all(file_paths, counting_method, output_path, extractor, cache,
+                long_edge=feature.WORKING_LONG_EDGE):
+    """Extracts features, reusing cached results for images seen before.
+
+    Cached images are not exported again, so lookups are skipped when
+    output_path is set and the cache is only filled.
+
+    Args:
+        file_paths (list(string)): The images to process.
+        counting_method (string) : The counting method used.
+        output_path (string)     : Optional directory to export intermediary
+            images to. Pass in None otherwise.
+        extractor (function)     : Called as extractor(file_paths) for the cache
+            misses; yields their Features in order.
+        cache (FeatureCache)     : The cache to read and fill.
+        long_edge (int)          : Long edge in pixels images are processed at.
+    Yields:
+        Features class -- The features of each image, in the order of file_paths.
+    """
+    keys   = [cache.key(file_path, counting_method, long_edge) for file_path in file_paths]
+    hits   = [None] * len(file_paths)
+    misses = []
+
+    for i, file_path in enumerate(file_paths):
+        if output_path is None:
+            hits[i] = cache.get(keys[i], os.path.basename(file_path))
+        if hits[i] is None:
+            misses.append(file_path)
+
+    computed = extractor(misses)
+    for i, cached in enumerate(hits):
+        if cached is not None:
+            yield cached
+        else:
+            features = next(computed)
+            cache.put(keys[i], features)
+            yield features
+
+    # Run the extractor to its end, so it can shut its workers down cleanly.
+    for _ in computed:
+        pass
+
+    cache.evict()
+
+
+def evict_after(results, cache):
+    """Passes results through and trims the cache once they are exhausted."""
+    for result in results:
+        yield result
+    cache.evict()
@@ -7,6 +7,7 @@ Attributes:
 """
 
 FILENAME  = 'csv/features.csv'
-HEADER    = ['image filename', 'front facing kernel count', "avg width/height ratio"]
+HEADER    = ['image filename', 'front facing kernel count', "avg width/height ratio", "std width/height ratio",
+             "mean kernel area", "std kernel area", "ear coverage"]
 DELIM     = '|'
 QUOTECHAR = '/'
\ No newline at end of file
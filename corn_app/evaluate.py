@@ -0,0 +1,83 @@
+"""Scores a trained model on a hold-out set of photos with known full counts
+
+The photos are processed in parallel and predicted in one batch by a single
+loaded model. The result lists the percent error of each photo, the mean
+absolute error and mean absolute percent error of the set, and the
+throughput, so it can gate changes on both accuracy and speed.
+
+Attributes:
+    FILENAME (str): Pattern of the csv file evaluation reports are written to
+    HEADER (list(str)): Header of the evaluation report
+"""
+from corn_app import feature
+from corn_app import parallel
+from corn_app import trainer
+import collections
+import csv
+import multiprocessing
+import ntpath
+import time
+
+FILENAME = 'csv/{model_name}_evaluation.csv'
+HEADER   = ['image filename', 'predicted kernel count', 'full kernel count', 'percent error']
+
+image_error        = collections.namedtuple('image_error', 'filename predicted actual percent_error')
+evaluation_summary = collections.namedtuple('evaluation_summary',
+                                            'images mae mape max_percent_error seconds images_per_second unmatched')
+
+
+def evaluate(file_paths, model_name, workers=None, counting_method='otsu',
+             long_edge=feature.WORKING_LONG_EDGE, total_counts=None):
+    """Predicts the full count of each photo and compares it to the hand count
+
+    Args:
+        file_paths (list(string)): The hold-out photos. Their names start with the ear ID.
+        model_name (string)      : Name of the model to score.
+        workers (int)            : Number of worker processes. Defaults to one per CPU.
+        counting_method (string) : The counting method used.
+        long_edge (int)          : Long edge in pixels photos are processed at.
+        total_counts (dict)      : Full kernel count keyed by ear ID. Read from
+            total_kernel_counts.csv when omitted.
+    Returns:
+        (list(image_error), evaluation_summary) -- The error of each photo with
+            a full count, in the order of file_paths, and the totals of the set.
+    """
+    workers      = workers or multiprocessing.cpu_count()
+    total_counts = trainer.read_total_counts() if total_counts is None else total_counts
+    start_time   = time.time()
+
+    # Photos without a full count are not processed at all.
+    matched   = [path for path in file_paths if trainer.ear_id(ntpath.basename(path)) in total_counts]
+    unmatched = [ntpath.basename(path) for path in file_paths if trainer.ear_id(ntpath.basename(path)) not in total_counts]
+
+    model    = trainer.load_model(model_name)
+    features = list(parallel.extract_all(matched, counting_method, None, workers, long_edge))
+    counts   = model.predict(features)
+
+    errors = []
+    for ear_features, predicted in zip(features, counts):
+        actual = total_counts[trainer.ear_id(ear_features.filename)]
+        errors.append(image_error(ear_features.filename, predicted, actual,
+                                  abs(predicted - actual) / actual * 100))
+
+    seconds = time.time() - start_time
+    images  = len(errors)
+    summary = evaluation_summary(
+        images            = images,
+        mae               = sum(abs(e.predicted - e.actual) for e in errors) / images if images else None,
+        mape              = sum(e.percent_error for e in errors) / images if images else None,
+        max_percent_error = max((e.percent_error for e in errors), default=None),
+        seconds           = seconds,
+        images_per_second = images / seconds if seconds > 0 else 0.0,
+        unmatched         = unmatched,
+    )
+    return errors, summary
+
+
+def write_report(errors, filename):
+    """Writes the error of each photo to a csv file"""
+    with open(filename, 'w') as csvfile:
+        report_writer = csv.writer(csvfile, delimiter=',', quotechar='/', quoting=csv.QUOTE_MINIMAL)
+        report_writer.writerow(HEADER)
+        for error in errors:
+            report_writer.writerow([error.filename, error.predicted, error.actual, f'{error.percent_error:.2f}'])
@@ -0,0 +1,120 @@
+"""Writes exported images on a background thread
+Attributes:
+    QUEUE_SIZE (int): Maximum number of images waiting to be written
+    FORMATS (dict): Exported image formats and their file extensions
+    JPEG_QUALITY (int): Default JPEG quality, 0 to 100
+    PNG_COMPRESSION (int): Default PNG compression level, 0 to 9
+"""
+import cv2
+import ntpath
+import os
+import queue
+import threading
+
+QUEUE_SIZE      = 8
+JPEG_QUALITY    = 95
+PNG_COMPRESSION = 3
+
+# The keys are valid inputs for the image_format argument
+FORMATS = {
+    'jpg': '.jpg',
+    'png': '.png'
+}
+
+# Marks the end of the queue.
+_DONE = None
+
+
+class ExportWriter(object):
+    """Queues images for export and writes them on a background thread, so
+       extraction only waits on the disk once the queue is full.
+
+    Attributes:
+        settings (dict): The constructor arguments, used to build an equivalent
+            writer in another process.
+    """
+
+    def __init__(self, output_path, image_format=None, jpeg_quality=JPEG_QUALITY,
+                 png_compression=PNG_COMPRESSION, preview_scale=None, queue_size=QUEUE_SIZE):
+        """
+        Args:
+            output_path (string)  : Directory the images are written to.
+            image_format (string) : Key of FORMATS. None keeps the extension of
+                the original photo.
+            jpeg_quality (int)    : JPEG quality, 0 to 100.
+            png_compression (int) : PNG compression level, 0 to 9.
+            preview_scale (float) : Downscales exported images by this factor to
+                write small previews. None writes them at full size.
+            queue_size (int)      : Maximum number of images waiting to be written.
+        """
+        self.output_path = output_path
+        self.settings    = {
+            'output_path':     output_path,
+            'image_format':    image_format,
+            'jpeg_quality':    jpeg_quality,
+            'png_compression': png_compression,
+            'preview_scale':   preview_scale,
+            'queue_size':      queue_size,
+        }
+
+        # OpenCV warns about parameters that do not belong to the format.
+        self.params = {
+            '.jpg':  [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality],
+            '.jpeg': [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality],
+            '.png':  [cv2.IMWRITE_PNG_COMPRESSION, png_compression],
+        }
+
+        self.image_format  = image_format
+        self.preview_scale = preview_scale
+        self.queue         = queue.Queue(maxsize=queue_size)
+        self.thread        = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def export_path(self, prefix, file):
+        """Path an image derived from the photo file is exported to"""
+        name = f'{prefix}_{ntpath.basename(file)}'
+        if self.image_format is not None:
+            name = os.path.splitext(name)[0] + FORMATS[self.image_format]
+        return os.path.join(self.output_path, name)
+
+    def write(self, prefix, file, image):
+        """Queues an image for export. The image must not be modified afterwards.
+
+        Args:
+            prefix (string)     : Prefix added to the exported file name
+            file (string)       : The file name of the original photo
+            image (openCV Image): The image to write
+        """
+        self.queue.put((self.export_path(prefix, file), image))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _DONE:
+                    return
+                self._write(*item)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, export_file, image):
+        if self.preview_scale is not None:
+            image = cv2.resize(image, None, fx=self.preview_scale, fy=self.preview_scale,
+                               interpolation=cv2.INTER_AREA)
+        try:
+            params = self.params.get(os.path.splitext(export_file)[1].lower(), [])
+            if not cv2.imwrite(export_file, image, params):
+                print(f'Could not export {export_file}')
+        except Exception as e:
+            print(e)
+
+    def flush(self):
+        """Waits until every queued image has been written"""
+        self.queue.join()
+
+    def close(self):
+        """Writes the remaining images and stops the background thread"""
+        if self.thread.is_alive():
+            self.queue.put(_DONE)
+            self.thread.join()
@@ -3,16 +3,27 @@ Attributes:
     CONTOUR_COLOR (tuple): RGB color value used to draw the contours
     BLOCK_SIZE (int): The pixel size of the square to find a threshold for
     LINE_WIDTH (int): The width of contour lines
+    EROSION_KERNEL (tuple): Rows and columns of the kernel used to erode the yellow mask
+    MEAN_SHIFT_SPATIAL_RADIUS (int): Spatial window radius of the mean shift filtering
+    MEAN_SHIFT_COLOR_RADIUS (int): Color window radius of the mean shift filtering
+    MIN_PEAK_DISTANCE (int): Minimum pixel distance between watershed markers
+    WORKING_LONG_EDGE (int): Long edge in pixels images are downsampled to before
+        processing. None processes images at full resolution.
+    ROI_MARGIN (int): Margin in pixels kept around the yellow pixels when the
+        masked image is cropped to the ear. None turns cropping off.
+    BLUR_RADIUS (int): Radius of the Gaussian blur applied to the HSV image
+    WORKSPACE_BUFFERS (int): Number of buffers a Workspace keeps before it
+        drops them all, e.g. when photo sizes vary
     COUNTING_METHODS (list(functions)): List containing all counting functions
 """
-from skimage.feature import peak_local_max
-from skimage.morphology import watershed
-from scipy import ndimage
+from corn_app import profiler
 import cv2
 import numpy as np
 import ntpath
 import os
 import collections
+import functools
+import threading
 
 # RGB color values
 GREY_SCALE_WHITE = 255
@@ -29,6 +40,22 @@ LINE_WIDTH = 5
 LOWER_BOUND_YELLOW = [20,100,100]
 UPPER_BOUND_YELLOW = [40,255,255]
 
+EROSION_KERNEL = (12,4)
+
+MEAN_SHIFT_SPATIAL_RADIUS = 21
+MEAN_SHIFT_COLOR_RADIUS   = 51
+MIN_PEAK_DISTANCE         = 20
+
+# The pixel sizes above are tuned for full resolution photos and are scaled
+# with the image when working at a lower resolution.
+WORKING_LONG_EDGE = None
+
+ROI_MARGIN = 80
+
+BLUR_RADIUS = 2
+
+WORKSPACE_BUFFERS = 64
+
 METHOD_NUMBER_BEGINNING = WATERSHED_METHOD = 0
 METHOD_NUMBER_ENDING    = OTSU_METHOD      = 1
 
@@ -40,23 +67,156 @@ METHODS_DICT = {
 
 class Features(object):
 
-    def __init__(self, filename, count, avg_w_h_ratio):
+    def __init__(self, filename, count, avg_w_h_ratio, std_w_h_ratio=0.0, mean_area=0.0, std_area=0.0,
+                 ear_coverage=0.0):
         self.filename      = filename
         self.count         = count
         self.avg_w_h_ratio = avg_w_h_ratio
+        self.std_w_h_ratio = std_w_h_ratio
+        self.mean_area     = mean_area
+        self.std_area      = std_area
+        self.ear_coverage  = ear_coverage
 
     def to_list(self):
-        return [self.filename, self.count, self.avg_w_h_ratio]
+        return [self.filename, self.count, self.avg_w_h_ratio, self.std_w_h_ratio, self.mean_area,
+                self.std_area, self.ear_coverage]
 
     def to_feed(self, x):
-        return {x: [[self.count, self.avg_w_h_ratio]]}
+        return {x: [self.to_vector()]}
+
+    def to_vector(self):
+        # Only the features the trained models were fitted on.
+        return [self.count, self.avg_w_h_ratio]
+
+
+def scale_length(length, scale):
+    """Scales a pixel length tuned for full resolution to the working resolution
+
+    Args:
+        length (int) : A length in pixels at full resolution.
+        scale (float): Working resolution divided by full resolution.
+    Returns:
+        int -- The scaled length, at least one pixel.
+    """
+    return max(1, int(round(length * scale)))
+
+
+def scale_block_size(block_size, scale):
+    """Scales an odd block size, keeping it odd and at least 3"""
+    return max(3, scale_length(block_size, scale) | 1)
+
+
+class Workspace(object):
+    """Intermediate images of the masking and contour stages, kept between
+       photos so same-sized photos reuse them instead of allocating new ones.
+
+    A buffer is only valid until the next call that asks for it by name, so
+    nothing handed back to a caller may live in the workspace.
+    """
+
+    def __init__(self, max_buffers=WORKSPACE_BUFFERS):
+        self.max_buffers = max_buffers
+        self.buffers     = {}
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """Returns the buffer of the given name, shape and type, allocating it
+           the first time it is asked for. Its content is undefined."""
+        key    = (name, tuple(shape), np.dtype(dtype).str)
+        buffer = self.buffers.get(key)
+
+        if buffer is None:
+            # Tiles and mixed photo sizes add a buffer per shape.
+            if len(self.buffers) >= self.max_buffers:
+                self.buffers.clear()
+            buffer = self.buffers[key] = np.empty(shape, dtype)
+
+        return buffer
+
+# Pipeline stages run in threads, so each thread gets its own workspace.
+_local = threading.local()
+
+def workspace():
+    """The Workspace of the current thread"""
+    if not hasattr(_local, 'workspace'):
+        _local.workspace = Workspace()
+    return _local.workspace
+
+@functools.lru_cache(maxsize=None)
+def hsv_bound(bound):
+    """A HSV bound as the array cv2.inRange takes, built once per bound"""
+    return np.array(bound)
 
+@functools.lru_cache(maxsize=None)
+def structuring_element(rows, cols):
+    """The erosion kernel of the given size, built once per size"""
+    return np.ones((rows, cols), np.uint8)
 
-def mask_yellow(image):
+
+def apply_tiled(function, image, output, tile_size, halo):
+    """Applies a local operator to an image tile by tile, so its intermediate
+       images are only ever the size of a tile
+
+    Each tile is passed with a halo of its neighbours' pixels and only its
+    own pixels are kept, so the output matches applying the operator to the
+    whole image as long as the halo covers the operator's reach.
+
+    Args:
+        function (function) : Maps an image to an image of the same height and width.
+        image (openCV Image): The image to process.
+        output (numpy array): Receives the result. Must have image's height and width.
+        tile_size (int)     : Height and width of a tile in pixels, without the halo.
+        halo (int)          : Pixels of overlap added around each tile.
+    Returns:
+        numpy array -- The output array.
+    """
+    height, width = image.shape[:2]
+
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            bottom     = min(top + tile_size, height)
+            right      = min(left + tile_size, width)
+            outer_top  = max(top - halo, 0)
+            outer_left = max(left - halo, 0)
+
+            tile = function(image[outer_top:min(bottom + halo, height), outer_left:min(right + halo, width)])
+            output[top:bottom, left:right] = tile[top - outer_top:bottom - outer_top,
+                                                  left - outer_left:right - outer_left]
+
+    return output
+
+
+def resize_to_working(image, long_edge):
+    """Downsamples an image so its long edge is at most long_edge pixels
+
+    Args:
+        image (openCV Image): An open Image object.
+        long_edge (int)     : Target long edge in pixels. None keeps full resolution.
+    Returns:
+        Named tuple -- A tuple containing the resized image and the scale applied
+                       collections.namedtuple('working_tuple','image scale')
+    """
+    working_tuple = collections.namedtuple('working_tuple','image scale')
+
+    if image is None or long_edge is None or max(image.shape[:2]) <= long_edge:
+        return working_tuple(image=image, scale=1.0)
+
+    scale  = long_edge / max(image.shape[:2])
+    height = scale_length(image.shape[0], scale)
+    width  = scale_length(image.shape[1], scale)
+    image  = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+    return working_tuple(image=image, scale=scale)
+
+
+def mask_yellow(image, scale=1.0, tile_size=None):
     """Converts all image pixels not in the yellow HSV range to black
 
     Args:
         image (openCV Image): An open Image object.
+        scale (float)       : Working resolution divided by full resolution.
+        tile_size (int)     : Masks the image in tiles of this many pixels so
+            the HSV, blurred and eroded images are never full size. None
+            masks the whole image at once.
 
     Returns:
         yellow_image (openCV Image): A BGR Image with yellow pixels extracted
@@ -65,20 +225,58 @@ def mask_yellow(image):
     if image is None:
         return None
 
+    if tile_size is None:
+        return mask_blurred_hsv(image, blur_hsv(image), scale)
+
+    # A tile's pixels depend on the blur and the erosion of their neighbours.
+    halo = BLUR_RADIUS + max(scale_length(size, scale) for size in EROSION_KERNEL)
+    return apply_tiled(lambda tile: mask_blurred_hsv(tile, blur_hsv(tile), scale),
+                       image, np.empty_like(image), tile_size, halo)
+
+def blur_hsv(image):
+    """Converts an image to HSV and blurs it, the first half of mask_yellow
+
+    Args:
+        image (openCV Image): An open Image object.
+    Returns:
+        openCV Image -- The blurred HSV image. It lives in the thread's
+            workspace, so it is overwritten by the next call.
+    """
+    buffers = workspace()
+
     #convert image to hsv
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=buffers.buffer('hsv', image.shape))
 
     '''blur hsv image so that pixels that are
     reflection of light on kernels get some yellow in them
     '''
-    blur = cv2.GaussianBlur(hsv_image, (5,5), 0)
+    return cv2.GaussianBlur(hsv_image, (2 * BLUR_RADIUS + 1,) * 2, 0, dst=buffers.buffer('blur', image.shape))
 
-    #create numpy arrays for lower and upper bounds of yellow
-    lower_yellow = np.array(LOWER_BOUND_YELLOW)
-    upper_yellow = np.array(UPPER_BOUND_YELLOW)
+def mask_blurred_hsv(image, blur, scale=1.0, lower_bound=None, upper_bound=None, erosion_kernel=None):
+    """Masks the yellow pixels of an image given its blurred HSV image, the
+       second half of mask_yellow. Parameter sweeps call it once per bound
+       pair and kernel on the same blur.
+
+    Args:
+        image (openCV Image): An open Image object.
+        blur (openCV Image) : The result of blur_hsv for the image.
+        scale (float)       : Working resolution divided by full resolution.
+        lower_bound (list)  : Lower HSV bound of yellow. Defaults to LOWER_BOUND_YELLOW.
+        upper_bound (list)  : Upper HSV bound of yellow. Defaults to UPPER_BOUND_YELLOW.
+        erosion_kernel (tuple): Rows and columns of the erosion kernel. Defaults
+            to EROSION_KERNEL.
+    Returns:
+        yellow_image (openCV Image): A BGR Image with yellow pixels extracted
+    """
+
+    buffers = workspace()
+
+    #numpy arrays for lower and upper bounds of yellow
+    lower_yellow = hsv_bound(tuple(LOWER_BOUND_YELLOW if lower_bound is None else lower_bound))
+    upper_yellow = hsv_bound(tuple(UPPER_BOUND_YELLOW if upper_bound is None else upper_bound))
 
     #turn all pixels not in yellow range. returns an hsv image
-    yellow_mask = cv2.inRange(blur, lower_yellow, upper_yellow)
+    yellow_mask = cv2.inRange(blur, lower_yellow, upper_yellow, dst=buffers.buffer('yellow mask', blur.shape[:2]))
 
     '''
     erosion:
@@ -89,71 +287,160 @@ def mask_yellow(image):
 
         Note: not to be confused with corn kernel
     '''
-    kernel = np.ones((12,4), np.uint8)
-    erosion = cv2.erode(yellow_mask, kernel, iterations = 1)
+    kernel_size = EROSION_KERNEL if erosion_kernel is None else erosion_kernel
+    kernel = structuring_element(*[scale_length(size, scale) for size in kernel_size])
+    erosion = cv2.erode(yellow_mask, kernel, dst=buffers.buffer('erosion', yellow_mask.shape), iterations = 1)
 
-    #apply the eroded image to mask original image
+    #apply the eroded image to mask original image. The masked image is
+    #handed on to later stages, so it is not a workspace buffer.
     yellow_image = cv2.bitwise_and(image, image, mask = erosion)
 
     return yellow_image
 
 
-def find_contours(image):
+def threshold_kernels(image, block_size):
+    """Adaptive threshold of the grayscale image, which outlines the kernels.
+       The result lives in the thread's workspace."""
+    buffers = workspace()
+    imgray  = cv2.cvtColor(image,cv2.COLOR_BGR2GRAY, dst=buffers.buffer('gray', image.shape[:2]))
+    return cv2.adaptiveThreshold(imgray, GREY_SCALE_WHITE, cv2.ADAPTIVE_THRESH_MEAN_C,\
+            cv2.THRESH_BINARY,block_size,0, dst=buffers.buffer('threshold', image.shape[:2]))
+
+def count_ear_pixels(image, tile_size=None):
+    """Number of pixels the yellow mask kept, counted tile by tile when a
+       tile size is given"""
+    step = tile_size or max(image.shape[:2])
+    return sum(cv2.countNonZero(cv2.cvtColor(image[top:top + step, left:left + step], cv2.COLOR_BGR2GRAY))
+               for top in range(0, image.shape[0], step) for left in range(0, image.shape[1], step))
+
+def contour_statistics(contours, scale=1.0, ear_pixels=0):
+    """Bounding box and area statistics of all contours, computed on their
+       stacked points instead of one contour at a time
+
+    Args:
+        contours (list(numpy array)): Contours returned by cv2.findContours.
+        scale (float)               : Working resolution divided by full resolution.
+        ear_pixels (int)            : Number of pixels of the ear the contours lie on.
+    Returns:
+        (float, contour_stats) -- The average width/height ratio, and the
+            spread of the ratios, the mean and spread of the contour areas in
+            full resolution pixels and the share of the ear they cover.
+            collections.namedtuple('contour_stats','std_w_h_ratio mean_area std_area ear_coverage')
+    """
+    contour_stats = collections.namedtuple('contour_stats','std_w_h_ratio mean_area std_area ear_coverage')
+
+    if len(contours) == 0:
+        return 0.0, contour_stats(std_w_h_ratio=0.0, mean_area=0.0, std_area=0.0, ear_coverage=0.0)
+
+    lengths = np.fromiter(map(len, contours), np.intp, len(contours))
+    starts  = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points  = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+
+    # Same boxes as cv2.boundingRect.
+    widths, heights = (np.maximum.reduceat(points, starts) - np.minimum.reduceat(points, starts) + 1).T
+    ratios          = widths / heights
+
+    # Same areas as cv2.contourArea, by the shoelace formula over each
+    # contour's points with its last point joined back to its first.
+    following                       = np.arange(1, len(points) + 1)
+    following[starts + lengths - 1] = starts
+    x, y  = points[:, 0], points[:, 1]
+    areas = np.abs(np.add.reduceat(x * y[following] - x[following] * y, starts)) / 2.0
+
+    # Summed in order, so the ratio matches the one models were trained on.
+    avg_w_h_ratio = sum(ratios.tolist()) / len(contours)
+
+    return avg_w_h_ratio, contour_stats(
+        std_w_h_ratio = float(ratios.std()),
+        mean_area     = float(areas.mean() / scale ** 2),
+        std_area      = float(areas.std() / scale ** 2),
+        ear_coverage  = float(areas.sum() / ear_pixels) if ear_pixels else 0.0)
+
+def find_contours(image, scale=1.0, block_size=None, tile_size=None):
     """Finds the contours of kernels on the ears of corn
     Args:
         image (openCV Image): An open Image object.
+        scale (float)       : Working resolution divided by full resolution.
+        block_size (int)    : Adaptive threshold block size at full resolution.
+            Defaults to BLOCK_SIZE.
+        tile_size (int)     : Thresholds the image in tiles of this many pixels
+            so the grayscale image is never full size. None thresholds the
+            whole image at once.
     Returns:
-        Image -- An image with the contours drawn in
+        Named tuple -- A tuple containing the image with the contours drawn in,
+                       the average contour width/height ratio, the number of
+                       contours, the contours themselves and the rest of
+                       their statistics, see contour_statistics. An image
+                       without contours has a ratio of 0.
+                       collections.namedtuple('contour_tuple','image avg_w_h_ratio contour_count contours stats')
     """
     if image is None:
         return None
 
-    imgray = cv2.cvtColor(image,cv2.COLOR_BGR2GRAY)
-    thres = cv2.adaptiveThreshold(imgray, GREY_SCALE_WHITE, cv2.ADAPTIVE_THRESH_MEAN_C,\
-            cv2.THRESH_BINARY,BLOCK_SIZE,0)
+    block_size = scale_block_size(BLOCK_SIZE if block_size is None else block_size, scale)
+
+    if tile_size is None:
+        thres = threshold_kernels(image, block_size)
+    else:
+        # The tiles are stitched into one binary image before the contours are
+        # traced, so kernels crossing a seam still get a single contour.
+        thres = apply_tiled(lambda tile: threshold_kernels(tile, block_size),
+                            image, workspace().buffer('tiled threshold', image.shape[:2]), tile_size, block_size // 2)
+
     im2, contours, hierarchy = cv2.findContours(thres, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Width height ratio of all contours
-    w_h_ratio = 0;
+    # Counted before the contour lines are drawn onto the ear.
+    avg_w_h_ratio, stats = contour_statistics(contours, scale, count_ear_pixels(image, tile_size))
 
-    # Sum the width height ratio of all contours while drawing them.
-    for (i, c) in enumerate(contours):
-        x,y,w,h = cv2.boundingRect(c)
-        w_h_ratio += ( w / h )
-        cv2.drawContours(image, [c], -1, CONTOUR_COLOR, LINE_WIDTH)
+    # The contour lines separate touching kernels for the counting methods,
+    # so they are part of the analysis rather than an overlay. Draw them all
+    # in a single call on the masked image, which the pipeline owns.
+    cv2.drawContours(image, contours, -1, CONTOUR_COLOR, scale_length(LINE_WIDTH, scale))
 
     # pack the result image and count into a named tuple
-    contour_tuple  = collections.namedtuple('contour_tuple','image avg_w_h_ratio')
-    contour_result = contour_tuple(image=image, avg_w_h_ratio=w_h_ratio / len(contours) )
+    contour_tuple  = collections.namedtuple('contour_tuple','image avg_w_h_ratio contour_count contours stats')
+    contour_result = contour_tuple(image=image, avg_w_h_ratio=avg_w_h_ratio,
+                                   contour_count=len(contours), contours=contours, stats=stats)
 
     return contour_result
 
-def watershed_method(image):
+def watershed_method(image, scale=1.0, mean_shift_radii=None):
     """Counts the kernels from a masked, contoured image of corn using
        the watershed function
 
     Args:
-        image (openCV Image): An open Image object.
+        image (openCV Image)   : An open Image object.
+        scale (float)          : Working resolution divided by full resolution.
+        mean_shift_radii (list): Spatial and color radius of the mean shift
+            filtering. Defaults to MEAN_SHIFT_SPATIAL_RADIUS and MEAN_SHIFT_COLOR_RADIUS.
     Returns:
-        Named tuple -- A tuple containing the counted image and kernel count
-                       collections.namedtuple('kernel_count_tuple','image count')
+        Named tuple -- A tuple containing the kernel count and the watershed
+                       labels, which render_watershed draws. The image is
+                       not modified.
+                       collections.namedtuple('kernel_count_tuple','count shapes')
     """
 
+    # scikit-image and scipy are slow to import, so only load
+    # them once the watershed method is actually used
+    from skimage.feature import peak_local_max
+    from skimage.morphology import watershed
+    from scipy import ndimage
+
     # perform pyramid mean shift filtering
     # to aid the thresholding step
-    shifted = cv2.pyrMeanShiftFiltering(image, 21, 51)
+    spatial_radius, color_radius = mean_shift_radii or (MEAN_SHIFT_SPATIAL_RADIUS, MEAN_SHIFT_COLOR_RADIUS)
+    shifted = cv2.pyrMeanShiftFiltering(image, scale_length(spatial_radius, scale), color_radius)
 
     # convert the mean shift image to grayscale, then apply
     # Otsu's thresholding
     gray = cv2.cvtColor(shifted, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 0, 255,
-        cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
 
     # compute the exact Euclidean distance from every binary
     # pixel to the nearest zero pixel, then find peaks in this
     # distance map
     D = ndimage.distance_transform_edt(thresh)
-    localMax = peak_local_max(D, indices=False, min_distance=20,
+    localMax = peak_local_max(D, indices=False, min_distance=scale_length(MIN_PEAK_DISTANCE, scale),
         labels=thresh)
 
     # perform a connected component analysis on the local peaks,
@@ -161,61 +448,106 @@ def watershed_method(image):
     markers = ndimage.label(localMax, structure=np.ones((3, 3)))[0]
     labels = watershed(-D, markers, mask=thresh)
 
-    # loop over the unique labels returned by the Watershed
-    # algorithm
-    for label in np.unique(labels):
-        # if the label is zero, we are examining the 'background'
-        # so simply ignore it
-        if label == 0:
-            continue
+    # every label other than the 'background' label zero is a kernel.
+    # find_objects has an entry for each label up to the largest one.
+    count = sum(1 for region in ndimage.find_objects(labels) if region is not None)
 
-        # otherwise, allocate memory for the label region and draw
-        # it on the mask
-        mask = np.zeros(gray.shape, dtype="uint8")
-        mask[labels == label] = 255
-
-        # detect contours in the mask and grab the largest one
-        cnts = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL,
-            cv2.CHAIN_APPROX_SIMPLE)[-2]
-        c = max(cnts, key=cv2.contourArea)
-
-        # draw a circle enclosing the object
-        ((x, y), r) = cv2.minEnclosingCircle(c)
-        cv2.circle(image, (int(x), int(y)), int(r), (0, 255, 0), 2)
-        cv2.putText(image, "#{}".format(label), (int(x) - 10, int(y)),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-    # pack the result image and count into a named tuple
-    kernel_count_tuple = collections.namedtuple('kernel_count_tuple','image count')
-    count_result       = kernel_count_tuple(image=image, count=len(np.unique(labels)) - 1)
+    # pack the count and labels into a named tuple
+    kernel_count_tuple = collections.namedtuple('kernel_count_tuple','count shapes')
+    count_result       = kernel_count_tuple(count=count, shapes=labels)
 
     return count_result
 
-def otsu_method(image):
+def otsu_method(image, scale=1.0, mean_shift_radii=None):
     """Counts the kernels from a masked, contoured image of corn using
        Otsu thresholding.
 
     Args:
-        image (openCV Image): An open Image object.
+        image (openCV Image)   : An open Image object.
+        scale (float)          : Working resolution divided by full resolution.
+        mean_shift_radii (list): Spatial and color radius of the mean shift
+            filtering. Defaults to MEAN_SHIFT_SPATIAL_RADIUS and MEAN_SHIFT_COLOR_RADIUS.
     Returns:
-        Named tuple -- A tuple containing the counted image and kernel count
-                       collections.namedtuple('kernel_count_tuple','image count')
+        Named tuple -- A tuple containing the kernel count and the kernel
+                       contours, which render_otsu draws. The image is not
+                       modified.
+                       collections.namedtuple('kernel_count_tuple','count shapes')
     """
 
     # perform pyramid mean shift filtering
     # to aid the thresholding step
-    shifted = cv2.pyrMeanShiftFiltering(image, 21, 51)
+    spatial_radius, color_radius = mean_shift_radii or (MEAN_SHIFT_SPATIAL_RADIUS, MEAN_SHIFT_COLOR_RADIUS)
+    shifted = cv2.pyrMeanShiftFiltering(image, scale_length(spatial_radius, scale), color_radius)
 
     # convert the mean shift image to grayscale, then apply
     # Otsu's thresholding
     gray = cv2.cvtColor(shifted, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 0, 255,
-        cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
 
     # find contours in the thresholded image
-    cnts = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL,
+    cnts = cv2.findContours(thresh, cv2.RETR_EXTERNAL,
         cv2.CHAIN_APPROX_SIMPLE)[-2]
 
+    # pack the count and contours into a named tuple
+    kernel_count_tuple = collections.namedtuple('kernel_count_tuple','count shapes')
+    count_result       = kernel_count_tuple(count=len(cnts), shapes=cnts)
+
+    return count_result
+
+def render_watershed(image, labels):
+    """Draws the kernels found by watershed_method on a copy of an image
+
+    Args:
+        image (openCV Image): The image the kernels were counted on.
+        labels (numpy array): The watershed labels returned by watershed_method.
+    Returns:
+        Image -- A copy of the image with each kernel circled and numbered
+    """
+    from scipy import ndimage
+
+    image = image.copy()
+
+    # loop over the bounding box of each label returned by the Watershed
+    # algorithm. find_objects skips the 'background' label zero.
+    for (index, region) in enumerate(ndimage.find_objects(labels)):
+        if region is None:
+            continue
+
+        label = index + 1
+
+        # grow the box by a pixel so the region does not touch its border,
+        # then draw the label region on a mask the size of the box
+        rows, cols = region
+        top    = max(rows.start - 1, 0)
+        left   = max(cols.start - 1, 0)
+        bottom = min(rows.stop + 1, labels.shape[0])
+        right  = min(cols.stop + 1, labels.shape[1])
+        mask   = np.where(labels[top:bottom, left:right] == label, 255, 0).astype("uint8")
+
+        # detect contours in the mask, in image coordinates, and grab the largest one
+        cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL,
+            cv2.CHAIN_APPROX_SIMPLE, offset=(left, top))[-2]
+        c = max(cnts, key=cv2.contourArea)
+
+        # draw a circle enclosing the object
+        ((x, y), r) = cv2.minEnclosingCircle(c)
+        cv2.circle(image, (int(x), int(y)), int(r), (0, 255, 0), 2)
+        cv2.putText(image, "#{}".format(label), (int(x) - 10, int(y)),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+    return image
+
+def render_otsu(image, cnts):
+    """Draws the kernels found by otsu_method on a copy of an image
+
+    Args:
+        image (openCV Image): The image the kernels were counted on.
+        cnts (list)         : The kernel contours returned by otsu_method.
+    Returns:
+        Image -- A copy of the image with each kernel outlined and numbered
+    """
+    image = image.copy()
+
     # loop over the contours
     for (i, c) in enumerate(cnts):
         # draw the contour
@@ -224,23 +556,75 @@ def otsu_method(image):
             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
         cv2.drawContours(image, [c], -1, (0, 255, 0), 2)
 
-    # pack the result image and count into a named tuple
-    kernel_count_tuple = collections.namedtuple('kernel_count_tuple','image count')
-    count_result       = kernel_count_tuple(image=image, count=len(cnts))
+    return image
 
-    return count_result
+def crop_to_roi(image, scale=1.0, margin=None):
+    """Crops a masked image to the bounding box of its yellow pixels, so the
+       contour stage only works on the ear
+
+    The counting methods must see the uncropped image, see paste_to_frame.
+    Their pyramid mean shift depends on where the image starts, so a crop
+    changes the count.
+
+    Args:
+        image (openCV Image): The result of mask_yellow.
+        scale (float)       : Working resolution divided by full resolution.
+        margin (int)        : Pixels kept around the yellow pixels at full
+            resolution. Defaults to ROI_MARGIN.
+    Returns:
+        (openCV Image, roi_tuple) -- The cropped image, and its left and top
+            offsets and the shape of the uncropped image.
+            collections.namedtuple('roi_tuple','left top frame_shape')
+    """
+    margin    = ROI_MARGIN if margin is None else margin
+    roi_tuple = collections.namedtuple('roi_tuple','left top frame_shape')
+
+    # Every pixel that survived the yellow mask has a bright channel, so it
+    # is non-zero in grayscale.
+    points = None if margin is None else cv2.findNonZero(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    if points is None:
+        return image, roi_tuple(left=0, top=0, frame_shape=image.shape)
+
+    x, y, w, h = cv2.boundingRect(points)
+    margin     = scale_length(margin, scale)
+    top        = max(y - margin, 0)
+    left       = max(x - margin, 0)
+    bottom     = min(y + h + margin, image.shape[0])
+    right      = min(x + w + margin, image.shape[1])
+
+    # Copied so the uncropped image can be freed.
+    return image[top:bottom, left:right].copy(), roi_tuple(left=left, top=top, frame_shape=image.shape)
+
+def paste_to_frame(image, roi=None):
+    """Places a cropped image in a black image the size of the uncropped one
+
+    Every pixel crop_to_roi cuts away is black, so this is the image the crop
+    was taken from.
+
+    Args:
+        image (openCV Image): An image cropped by crop_to_roi.
+        roi (roi_tuple)     : Where the image sits in the uncropped image,
+            or None if it is not cropped.
+    Returns:
+        openCV Image -- The uncropped image.
+    """
+    if roi is None or image.shape == tuple(roi.frame_shape):
+        return image
+
+    frame = np.zeros(roi.frame_shape, image.dtype)
+    frame[roi.top:roi.top + image.shape[0], roi.left:roi.left + image.shape[1]] = image
+    return frame
 
 COUNTING_METHODS = [watershed_method, otsu_method]
+RENDER_METHODS   = [render_watershed, render_otsu]
 
-def extract_features(file_path, counting_method, output_path):
-    """Finds the contours of kernels on the ears of corn
+def read_image(file_path):
+    """Decodes an image from disk
     Args:
-        file_path (string)      : The file_path of the image
-        counting_method (string): The counting method used
-        output_path (string)    : Optional method to output intermediary images to
-            output path. Pass in None otherwise.
+        file_path (string): The file_path of the image
     Returns:
-        Features class -- An object containg the image's features.
+        Named tuple -- A tuple containing the image's file name and the decoded image
+                       collections.namedtuple('read_tuple','file image')
     """
 
     file  = None
@@ -252,35 +636,202 @@ def extract_features(file_path, counting_method, output_path):
     except Exception as e:
         print(e)
 
+    read_tuple = collections.namedtuple('read_tuple','file image')
+    return read_tuple(file=file, image=image)
+
+def decode_image(data):
+    """Decodes an image from the bytes of an image file
+    Args:
+        data (bytes): The content of an image file, e.g. a JPEG
+    Returns:
+        openCV Image -- The decoded image, or None if the bytes are not an image
+    """
+    # imdecode asserts on an empty buffer instead of returning None.
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def export_image(output_path, prefix, file, image):
+    """Writes an intermediary image to the output path
+    Args:
+        output_path (string): Directory to export to, or an ExportWriter that
+            writes the image in the background. Nothing is written if None.
+        prefix (string)     : Prefix added to the exported file name
+        file (string)       : The file name of the original image
+        image (openCV Image): The image to write
+    """
+    if not output_path:
+        return
+
+    if hasattr(output_path, 'write'):
+        output_path.write(prefix, file, image)
+    else:
+        export_file = os.path.join(output_path, f'{prefix}_{file}')
+        cv2.imwrite(export_file, image)
+
+def extract_features(file_path, counting_method, output_path, long_edge=WORKING_LONG_EDGE, trace=profiler.NULL_TRACE, mask_cache=None, tile_size=None):
+    """Finds the contours of kernels on the ears of corn
+    Args:
+        file_path (string)      : The file_path of the image
+        counting_method (string): The counting method used
+        output_path (string)    : Optional method to output intermediary images to
+            output path. Pass in None otherwise.
+        long_edge (int)         : Long edge in pixels the image is processed at.
+            None processes the image at full resolution.
+        trace (ImageTrace)      : Optional trace the time of each stage is recorded in.
+        mask_cache (MaskCache)  : Optional cache of masked images. A cached mask
+            skips decoding and masking the photo.
+        tile_size (int)         : Optional tile size in pixels the masking and
+            thresholding stages work in. Bounds their intermediate images
+            only, the photo, mask and threshold are still full size.
+    Returns:
+        Features class -- An object containg the image's features.
+    """
+
+    if mask_cache is None:
+        with trace.stage('decode'):
+            file, image = read_image(file_path)
+
+        return features_from_image(file, image, counting_method, output_path, long_edge, trace, tile_size)
+
+    key = mask_cache.key(file_path, long_edge)
+    with trace.stage('mask cache'):
+        cached = mask_cache.get(key)
+
+    if cached is not None:
+        file = ntpath.basename(file_path)
+        masked_image, scale, roi = cached
+    else:
+        with trace.stage('decode'):
+            file, image = read_image(file_path)
+        masked_image, scale, roi = mask_working_image(image, long_edge, trace, tile_size)
+        # Stored before the contours are drawn onto the masked image.
+        mask_cache.put(key, masked_image, scale, roi)
+
+    return features_from_mask(file, masked_image, scale, counting_method, output_path, trace, roi, tile_size)
+
+def mask_working_image(image, long_edge=WORKING_LONG_EDGE, trace=profiler.NULL_TRACE, tile_size=None):
+    """Downsamples an image to the working resolution, masks its yellow
+       pixels and crops it to the ear
+
+    Returns:
+        (openCV Image, float, roi_tuple) -- The masked image, its scale and
+            where it sits in the working image.
+    """
+    with trace.stage('resize'):
+        image, scale = resize_to_working(image, long_edge)
+
+    with trace.stage('mask'):
+        masked_image = mask_yellow(image, scale, tile_size)
+
+    with trace.stage('roi'):
+        masked_image, roi = crop_to_roi(masked_image, scale)
+
+    return masked_image, scale, roi
+
+def features_from_image(file, image, counting_method, output_path, long_edge=WORKING_LONG_EDGE, trace=profiler.NULL_TRACE, tile_size=None):
+    """Finds the features of an image that is already decoded
+    Args:
+        file (string)           : The file name of the image
+        image (openCV Image)    : The decoded image
+        counting_method (string): The counting method used
+        output_path (string)    : Optional method to output intermediary images to
+            output path. Pass in None otherwise. Images are exported at the
+            working resolution.
+        long_edge (int)         : Long edge in pixels the image is processed at.
+            None processes the image at full resolution.
+        trace (ImageTrace)      : Optional trace the time of each stage is recorded in.
+        tile_size (int)         : Optional tile size in pixels the masking and
+            thresholding stages work in.
+    Returns:
+        Features class -- An object containg the image's features.
+    """
+
+    masked_image, scale, roi = mask_working_image(image, long_edge, trace, tile_size)
+
+    return features_from_mask(file, masked_image, scale, counting_method, output_path, trace, roi, tile_size)
+
+def features_from_mask(file, masked_image, scale, counting_method, output_path, trace=profiler.NULL_TRACE, roi=None, tile_size=None):
+    """Finds the features of an image whose yellow pixels are already masked
+    Args:
+        file (string)              : The file name of the image
+        masked_image (openCV Image): The result of mask_yellow. Contours are
+            drawn onto it.
+        scale (float)              : Working resolution divided by full resolution.
+        counting_method (string)   : The counting method used
+        output_path (string)       : Optional method to output intermediary images to
+            output path. Pass in None otherwise.
+        trace (ImageTrace)         : Optional trace the time of each stage is recorded in.
+        roi (roi_tuple)            : Where a masked image cropped by crop_to_roi
+            sits in the working image. Kernels are counted and exported
+            images drawn on the whole working image.
+        tile_size (int)            : Optional tile size in pixels the image is
+            thresholded in.
+    Returns:
+        Features class -- An object containg the image's features.
+    """
+
+    if trace.enabled:
+        # Counted before contours are drawn onto the masked image.
+        trace.note(pixels=masked_image.shape[0] * masked_image.shape[1],
+                   yellow_pixels=int(np.count_nonzero(masked_image.any(axis=2))))
+
     # Countour the image.
-    contour_results = find_contours(mask_yellow(image))
+    with trace.stage('contour'):
+        contour_results = find_contours(masked_image, scale, tile_size=tile_size)
     contoured_image = contour_results.image
-    if output_path:
-        export_file = os.path.join(output_path, f'contoured_{file}')
-        cv2.imwrite(export_file, contoured_image)
 
-    # Count the front facing kernels.
-    count_results   = count_kernels(contoured_image, METHODS_DICT[counting_method])
+    # Count the front facing kernels on the uncropped image.
+    with trace.stage('count'):
+        contoured_image = paste_to_frame(contoured_image, roi)
+        count_results   = count_kernels(contoured_image, METHODS_DICT[counting_method], scale)
+
+    # Overlays are only drawn when someone will look at them.
     if output_path:
-        export_file = os.path.join(output_path, f'{counting_method}_{file}')
-        cv2.imwrite(export_file, count_results.image)
+        with trace.stage('render'):
+            counted_image = render_kernels(contoured_image, METHODS_DICT[counting_method], count_results)
+        with trace.stage('export'):
+            export_image(output_path, 'contoured', file, contoured_image)
+            export_image(output_path, counting_method, file, counted_image)
+
+    trace.note(contours=contour_results.contour_count, kernels=count_results.count)
 
-    features = Features(file, count_results.count, contour_results.avg_w_h_ratio)
+    features = Features(file, count_results.count, contour_results.avg_w_h_ratio, *contour_results.stats)
 
     return features
 
-def count_kernels(image, method_number):
+def count_kernels(image, method_number, scale=1.0, mean_shift_radii=None):
     """Routes the image to the specified counting method
 
     Args:
-        image (openCV Image): An open Image object.
-        method_number (int) : A handle to a counting function
+        image (openCV Image)   : An open Image object.
+        method_number (int)    : A handle to a counting function
+        scale (float)          : Working resolution divided by full resolution.
+        mean_shift_radii (list): Optional spatial and color radius of the mean
+            shift filtering.
+    Returns:
+        Named tuple -- A tuple containing the kernel count and the shapes
+                       the counting method found
+                       collections.namedtuple('kernel_count_tuple','count shapes')
+    """
+
+    if METHOD_NUMBER_BEGINNING <= method_number <= METHOD_NUMBER_ENDING:
+        return COUNTING_METHODS[method_number](image, scale, mean_shift_radii)
+    else:
+        raise ValueError('Argument method_number is not within range')
+
+def render_kernels(image, method_number, count_results):
+    """Routes the result of a counting method to the function that draws it
+
+    Args:
+        image (openCV Image)       : The image the kernels were counted on.
+        method_number (int)        : A handle to a counting function
+        count_results (Named tuple): The result of count_kernels
     Returns:
-        Named tuple -- A tuple containing the counted image and kernel count
-                       collections.namedtuple('kernel_count_tuple','image count')
+        Image -- A copy of the image with the counted kernels drawn in
     """
 
     if METHOD_NUMBER_BEGINNING <= method_number <= METHOD_NUMBER_ENDING:
-        return COUNTING_METHODS[method_number](image)
+        return RENDER_METHODS[method_number](image, count_results.shapes)
     else:
         raise ValueError('Argument method_number is not within range')
@@ -0,0 +1,173 @@
+"""Stores extracted features in a binary, columnar layout
+
+Each column of Features after the file name is kept in its own .npy file, so
+readers memory map the columns instead of parsing text. The file names are
+kept in a text index, one per line, in row order. Rows are appended to
+temporary files as photos are processed. When the store is closed the .npy
+headers are rewritten with the final row count and the temporary files
+replace the store's files. A run that dies or raises before closing the
+store therefore leaves the last completed run readable.
+
+Attributes:
+    STORE_DIR (str): Default directory of the feature store
+    INDEX_FILENAME (str): Name of the file name index inside the store
+    COLUMNS (list(tuple)): Name and numpy dtype of each stored column, in the
+        order of Features.to_list() after the file name. The names are the
+        Features attributes.
+"""
+from corn_app import csv_features
+from corn_app import feature
+import collections
+import csv
+import itertools
+import numpy as np
+import os
+import struct
+
+STORE_DIR      = 'csv/features'
+INDEX_FILENAME = 'filenames.txt'
+
+COLUMNS = [
+    ('count',         '<i8'),
+    ('avg_w_h_ratio', '<f8'),
+    ('std_w_h_ratio', '<f8'),
+    ('mean_area',     '<f8'),
+    ('std_area',      '<f8'),
+    ('ear_coverage',  '<f8'),
+]
+
+# Fixed size of each .npy header, so it can be rewritten in place.
+HEADER_SIZE = 128
+
+feature_table = collections.namedtuple('feature_table', 'filenames columns')
+
+
+def column_path(directory, name):
+    return os.path.join(directory, f'{name}.npy')
+
+
+def exists(directory=STORE_DIR):
+    """True if a feature store has been written to the directory"""
+    return os.path.exists(os.path.join(directory, INDEX_FILENAME))
+
+
+def _npy_header(dtype, rows):
+    """Version 1.0 .npy header of a one dimensional column, padded to HEADER_SIZE"""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (dtype, rows)
+    header = header.ljust(HEADER_SIZE - 11) + '\n'
+    return np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def load_array(path):
+    """Memory maps a .npy file, reading it into memory only when it is empty"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # An empty array cannot be memory mapped.
+        return np.load(path)
+
+
+class FeatureStoreWriter(object):
+    """Appends the features of processed photos to a feature store"""
+
+    def __init__(self, directory=STORE_DIR, append=False):
+        """
+        Args:
+            directory (string): Directory of the feature store.
+            append (bool)     : Adds rows to an existing store instead of replacing it.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        table     = load(directory) if append and exists(directory) else None
+        filenames = table.filenames if table else []
+
+        self.directory = directory
+        self.rows      = len(filenames)
+        self.paths     = [column_path(directory, name) for name, _ in COLUMNS] + [os.path.join(directory, INDEX_FILENAME)]
+        self.files     = []
+
+        for (name, dtype), path in zip(COLUMNS, self.paths):
+            column_file = open(f'{path}.tmp', 'wb')
+            column_file.write(_npy_header(dtype, 0))
+            if self.rows:
+                # Columns added after the store was written start out as zeros.
+                column = table.columns.get(name, np.zeros(self.rows))
+                column_file.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+            self.files.append(column_file)
+
+        self.index_file = open(f'{self.paths[-1]}.tmp', 'w')
+        self.index_file.writelines(f'{filename}\n' for filename in filenames)
+
+    def append(self, features):
+        """Adds the features of one photo as the last row"""
+        values = features.to_list()
+        for (name, dtype), column_file, value in zip(COLUMNS, self.files, values[1:]):
+            column_file.write(np.array(value, dtype=dtype).tobytes())
+        self.index_file.write(f'{values[0]}\n')
+        self.rows += 1
+
+    def close(self):
+        """Writes the final row count to the column headers and replaces the
+           store's files, the index last"""
+        for (name, dtype), column_file in zip(COLUMNS, self.files):
+            column_file.seek(0)
+            column_file.write(_npy_header(dtype, self.rows))
+            column_file.close()
+        self.index_file.close()
+
+        for path in self.paths:
+            os.replace(f'{path}.tmp', path)
+
+    def abort(self):
+        """Discards the rows written, leaving the store as it was"""
+        for open_file in self.files + [self.index_file]:
+            open_file.close()
+        for path in self.paths:
+            os.remove(f'{path}.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def load(directory=STORE_DIR):
+    """Opens a feature store without copying its columns
+
+    Returns:
+        feature_table -- The file name of each row and a dict of the memory
+            mapped columns keyed by column name. Columns added after the
+            store was written are left out.
+    Raises:
+        IOError: No feature store exists in the directory.
+    """
+    columns = {name: load_array(column_path(directory, name)) for name, _ in COLUMNS
+               if os.path.exists(column_path(directory, name))}
+
+    if not columns or not exists(directory):
+        raise IOError(f'No feature store in {directory}')
+    rows    = min(len(column) for column in columns.values())
+
+    with open(os.path.join(directory, INDEX_FILENAME), 'r') as index_file:
+        filenames = [line.rstrip('\n') for line in itertools.islice(index_file, rows)]
+
+    return feature_table(filenames, {name: column[:len(filenames)] for name, column in columns.items()})
+
+
+def iter_features(table):
+    """Yields the rows of a feature table as Features objects"""
+    for row, filename in enumerate(table.filenames):
+        yield feature.Features(filename, **{name: column[row].item() for name, column in table.columns.items()})
+
+
+def export_csv(table, filename=csv_features.FILENAME):
+    """Writes a feature table to the features csv file"""
+    with open(filename, 'w') as csvfile:
+        feature_writer = csv.writer(csvfile, delimiter=csv_features.DELIM, quotechar=csv_features.QUOTECHAR, quoting=csv.QUOTE_MINIMAL)
+        feature_writer.writerow(csv_features.HEADER)
+        for features in iter_features(table):
+            feature_writer.writerow(features.to_list())
@@ -0,0 +1,122 @@
+"""Fans feature extraction out across a pool of worker processes
+Attributes:
+    DEFAULT_WORKERS (int): Number of worker processes used when none is given
+"""
+from corn_app import export
+from corn_app import feature
+from corn_app import profiler
+import multiprocessing
+import multiprocessing.util
+import cv2
+
+DEFAULT_WORKERS = 1
+
+# ExportWriter of the current worker process, if the pool exports images.
+_writer = None
+
+
+def opencv_threads(workers):
+    """Number of threads each worker's OpenCV may use so the pool does not
+       oversubscribe the CPU.
+
+    Args:
+        workers (int): Number of worker processes in the pool.
+    Returns:
+        int -- Threads available to OpenCV inside one worker.
+    """
+    return max(1, multiprocessing.cpu_count() // max(1, workers))
+
+
+def _init_worker(cv_threads, export_settings):
+    """Pool initializer limiting OpenCV's internal thread pool and starting
+       the worker's own export writer."""
+    global _writer
+
+    cv2.setNumThreads(cv_threads)
+
+    if export_settings is not None:
+        _writer = export.ExportWriter(**export_settings)
+        # Runs when the worker exits after the pool is closed.
+        multiprocessing.util.Finalize(_writer, _writer.close, exitpriority=10)
+
+
+def _extract(job):
+    """Unpacks a job tuple and extracts the features of one image.
+
+    Returns:
+        (Features, ImageTrace) -- The features, and the trace of the image
+            when profiling or None otherwise.
+    """
+    file_path, counting_method, output_path, long_edge, profile, mask_cache, tile_size = job
+
+    if _writer is not None:
+        output_path = _writer
+
+    if not profile:
+        return feature.extract_features(file_path, counting_method, output_path, long_edge,
+                                        mask_cache=mask_cache, tile_size=tile_size), None
+
+    trace    = profiler.ImageTrace(file_path)
+    features = feature.extract_features(file_path, counting_method, output_path, long_edge, trace, mask_cache, tile_size)
+    trace.finish()
+    return features, trace
+
+
+def _finish(result, trace_sink):
+    """Hands the trace of a result to the sink and returns its features."""
+    features, trace = result
+    if trace is not None:
+        trace_sink(trace)
+    return features
+
+
+def extract_all(file_paths, counting_method, output_path, workers=DEFAULT_WORKERS,
+                long_edge=feature.WORKING_LONG_EDGE, trace_sink=None, mask_cache=None, tile_size=None):
+    """Extracts the features of many images, optionally in parallel.
+
+    Args:
+        file_paths (list(string)): The images to process.
+        counting_method (string) : The counting method used.
+        output_path (string)     : Optional directory or ExportWriter to export
+            intermediary images to. Pass in None otherwise. Each worker
+            process writes through its own copy of an ExportWriter.
+        workers (int)            : Number of worker processes. 1 runs in the
+            current process.
+        long_edge (int)          : Long edge in pixels images are processed at.
+            None processes images at full resolution.
+        trace_sink (function)    : Optional function called in this process
+            with the ImageTrace of each image, which turns on profiling.
+        mask_cache (MaskCache)   : Optional cache of masked images, shared by
+            the workers through the file system.
+        tile_size (int)          : Optional tile size in pixels images are
+            masked and thresholded in, bounding the memory of each worker.
+    Yields:
+        Features class -- The features of each image, in the order of file_paths.
+    """
+    profile = trace_sink is not None
+    jobs    = [(file_path, counting_method, output_path, long_edge, profile, mask_cache, tile_size) for file_path in file_paths]
+
+    if workers <= 1:
+        for job in jobs:
+            yield _finish(_extract(job), trace_sink)
+        return
+
+    export_settings = None
+    if isinstance(output_path, export.ExportWriter):
+        export_settings = output_path.settings
+        jobs = [(file_path, counting_method, None, long_edge, profile, mask_cache, tile_size) for file_path in file_paths]
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(opencv_threads(workers), export_settings))
+    try:
+        # imap hands back results in submission order, so rows stay sorted.
+        for i, result in enumerate(pool.imap(_extract, jobs)):
+            if i == len(jobs) - 1:
+                # Let the workers exit on their own so their export writers
+                # flush. Done before the last result is handed back, as the
+                # caller need not ask for more once it has every result.
+                pool.close()
+                pool.join()
+            yield _finish(result, trace_sink)
+    finally:
+        pool.terminate()
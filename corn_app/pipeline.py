@@ -0,0 +1,213 @@
+"""Streams images through the feature extraction stages concurrently
+
+Each stage (decode, mask, contour, count, export) runs in its own thread and
+hands its output to the next stage through a bounded queue. OpenCV releases
+the GIL while it works, so disk reads and JPEG decodes overlap with the
+compute-bound stages, and at most QUEUE_SIZE images wait between any two
+stages no matter how many photos are processed.
+
+Attributes:
+    QUEUE_SIZE (int): Maximum number of images buffered between two stages
+    POLL_SECONDS (float): How often blocked stages check for a shutdown
+"""
+from corn_app import feature
+from corn_app import profiler
+import ntpath
+import numpy as np
+import queue
+import threading
+
+QUEUE_SIZE   = 4
+POLL_SECONDS = 0.1
+
+# Marks the end of the stream.
+_DONE = object()
+
+
+class _Failure(object):
+    """Carries an exception raised by a stage down to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class _Job(object):
+    """State of one image as it moves through the stages."""
+
+    def __init__(self, file_path, profile):
+        self.file_path       = file_path
+        self.trace           = profiler.ImageTrace(file_path, wall_clock=False) if profile else profiler.NULL_TRACE
+        self.file            = None
+        self.key             = None
+        self.image           = None
+        self.scale           = 1.0
+        self.roi             = None
+        self.masked          = False
+        self.contour_results = None
+        self.count_results   = None
+
+
+def _put(outbox, item, stop):
+    """Puts an item on a queue unless the pipeline is shut down first.
+
+    Returns:
+        bool -- True if the item was queued.
+    """
+    while not stop.is_set():
+        try:
+            outbox.put(item, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(inbox, stop):
+    """Takes an item off a queue, or returns _DONE if the pipeline is shut down."""
+    while not stop.is_set():
+        try:
+            return inbox.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _run_source(file_paths, profile, outbox, stop):
+    """Feeds the file paths into the first stage."""
+    for file_path in file_paths:
+        if not _put(outbox, _Job(file_path, profile), stop):
+            return
+    _put(outbox, _DONE, stop)
+
+
+def _run_stage(name, function, inbox, outbox, stop):
+    """Applies function to every job in inbox and passes the job on to outbox."""
+    while True:
+        job = _get(inbox, stop)
+        if job is _DONE or isinstance(job, _Failure):
+            _put(outbox, job, stop)
+            return
+
+        try:
+            with job.trace.stage(name):
+                function(job)
+        except Exception as e:
+            job = _Failure(e)
+
+        if not _put(outbox, job, stop):
+            return
+
+
+def _decode(job, long_edge, mask_cache):
+    if mask_cache is not None:
+        job.key = mask_cache.key(job.file_path, long_edge)
+        cached  = mask_cache.get(job.key)
+        if cached is not None:
+            job.file             = ntpath.basename(job.file_path)
+            job.image, job.scale, job.roi = cached
+            job.masked           = True
+            return
+
+    job.file, job.image  = feature.read_image(job.file_path)
+    job.image, job.scale = feature.resize_to_working(job.image, long_edge)
+
+
+def _mask(job, mask_cache, tile_size):
+    if not job.masked:
+        job.image          = feature.mask_yellow(job.image, job.scale, tile_size)
+        job.image, job.roi = feature.crop_to_roi(job.image, job.scale)
+        if mask_cache is not None:
+            mask_cache.put(job.key, job.image, job.scale, job.roi)
+
+    if job.trace.enabled:
+        job.trace.note(pixels=job.image.shape[0] * job.image.shape[1],
+                       yellow_pixels=int(np.count_nonzero(job.image.any(axis=2))))
+
+
+def _contour(job, tile_size):
+    job.contour_results = feature.find_contours(job.image, job.scale, tile_size=tile_size)
+
+
+def _count(job, counting_method):
+    # Counted on the uncropped image, which the export stage draws on too.
+    job.contour_results = job.contour_results._replace(image=feature.paste_to_frame(job.contour_results.image, job.roi))
+    job.count_results   = feature.count_kernels(job.contour_results.image,
+                                                feature.METHODS_DICT[counting_method], job.scale)
+    job.trace.note(contours=job.contour_results.contour_count, kernels=job.count_results.count)
+
+
+def _export(job, counting_method, output_path):
+    if output_path:
+        # Overlays are drawn here, off the analysis stages.
+        counted_image = feature.render_kernels(job.contour_results.image, feature.METHODS_DICT[counting_method],
+                                               job.count_results)
+        feature.export_image(output_path, 'contoured', job.file, job.contour_results.image)
+        feature.export_image(output_path, counting_method, job.file, counted_image)
+
+    # Release the image buffers before the job waits on the consumer.
+    job.image           = None
+    job.contour_results = job.contour_results._replace(image=None, contours=None)
+    job.count_results   = job.count_results._replace(shapes=None)
+
+
+def extract_all(file_paths, counting_method, output_path, queue_size=QUEUE_SIZE,
+                long_edge=feature.WORKING_LONG_EDGE, trace_sink=None, mask_cache=None, tile_size=None):
+    """Extracts the features of many images through a pipeline of concurrent stages.
+
+    Args:
+        file_paths (list(string)): The images to process.
+        counting_method (string) : The counting method used.
+        output_path (string)     : Optional directory to export intermediary
+            images to. Pass in None otherwise.
+        queue_size (int)         : Maximum number of images buffered between
+            two stages.
+        long_edge (int)          : Long edge in pixels images are processed at.
+            None processes images at full resolution.
+        trace_sink (function)    : Optional function called with the
+            ImageTrace of each image, which turns on profiling.
+        mask_cache (MaskCache)   : Optional cache of masked images. Cached
+            images skip the decode and mask work.
+        tile_size (int)          : Optional tile size in pixels images are
+            masked and thresholded in.
+    Yields:
+        Features class -- The features of each image, in the order of file_paths.
+    """
+    stages = [
+        ('decode',  lambda job: _decode(job, long_edge, mask_cache)),
+        ('mask',    lambda job: _mask(job, mask_cache, tile_size)),
+        ('contour', lambda job: _contour(job, tile_size)),
+        ('count',   lambda job: _count(job, counting_method)),
+        ('export',  lambda job: _export(job, counting_method, output_path)),
+    ]
+
+    stop    = threading.Event()
+    queues  = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_run_source,
+                                args=(file_paths, trace_sink is not None, queues[0], stop))]
+
+    for i, (name, function) in enumerate(stages):
+        threads.append(threading.Thread(target=_run_stage,
+                                        args=(name, function, queues[i], queues[i + 1], stop)))
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        while True:
+            job = _get(queues[-1], stop)
+            if job is _DONE:
+                break
+            if isinstance(job, _Failure):
+                raise job.error
+
+            if trace_sink is not None:
+                job.trace.finish()
+                trace_sink(job.trace)
+
+            yield feature.Features(job.file, job.count_results.count,
+                                   job.contour_results.avg_w_h_ratio, *job.contour_results.stats)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
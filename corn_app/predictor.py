@@ -0,0 +1,80 @@
+"""Predicts full kernel counts from exported model weights without TensorFlow
+Attributes:
+    MODELS_DIR  (str): Directory the trained models are saved in
+    WEIGHTS_EXT (str): Extension of the exported weight file
+    PREDICTIONS_FILENAME (str): Pattern of the csv file batch predictions are written to
+    PREDICTIONS_HEADER (list(str)): Header of the predictions csv file
+"""
+from corn_app import csv_features
+import numpy as np
+import os
+
+MODELS_DIR  = 'models'
+WEIGHTS_EXT = '.npz'
+
+PREDICTIONS_FILENAME = 'csv/{model_name}_predictions.csv'
+PREDICTIONS_HEADER   = csv_features.HEADER + ['predicted kernel count']
+
+
+def weights_path(model_name):
+    """Path of the exported weight file of a model"""
+    return os.path.join(MODELS_DIR, model_name, f'{model_name}{WEIGHTS_EXT}')
+
+
+def save_weights(model_name, weight, basis):
+    """Exports the weights and basis of a trained model
+
+    Args:
+        model_name (str)    : Name of the model
+        weight (numpy array): Weights shaped [N, 1]
+        basis (numpy array) : Basis shaped [1]
+    """
+    os.makedirs(os.path.join(MODELS_DIR, model_name), exist_ok=True)
+    np.savez(weights_path(model_name), W=weight, b=basis)
+
+
+class Model(object):
+    """A trained linear model kept in memory for repeated predictions"""
+
+    def __init__(self, weight, basis):
+        self.weight = np.asarray(weight, dtype=np.float64).reshape(-1, 1)
+        self.basis  = np.asarray(basis,  dtype=np.float64).reshape(1)
+
+    @classmethod
+    def load(cls, model_name):
+        """Loads the exported weights of a model
+
+        Args:
+            model_name (str): Name of the model
+        Returns:
+            Model -- The loaded model.
+        Raises:
+            IOError: The model has no exported weight file.
+        """
+        with np.load(weights_path(model_name)) as weights:
+            return cls(weights['W'], weights['b'])
+
+    def predict_array(self, x_data):
+        """Predicts the full kernel counts of a matrix of features
+
+        Args:
+            x_data (numpy array): Features, one row per ear
+        Returns:
+            numpy array -- The predicted full kernel count of each row.
+        """
+        x_data = np.atleast_2d(np.asarray(x_data, dtype=np.float64))
+        return (x_data @ self.weight + self.basis)[:, 0]
+
+    def predict(self, features_list):
+        """Predicts the full kernel counts of many ears
+
+        Args:
+            features_list (list(Features)): The features of each ear
+        Returns:
+            list(int) -- The predicted full kernel count of each ear.
+        """
+        if len(features_list) == 0:
+            return []
+
+        x_data = [features.to_vector() for features in features_list]
+        return [int(count) for count in self.predict_array(x_data)]
@@ -0,0 +1,173 @@
+"""Records where the time goes while features are extracted
+
+An ImageTrace follows one image through the pipeline, timing each stage and
+noting sizes such as pixel and contour counts. Traces are small plain
+objects, so worker processes can hand them back to the parent, where a
+Profiler appends them to a JSONL file and summarizes the run.
+
+Attributes:
+    TRACE_FILENAME (str): Default JSONL file the traces are written to
+    SLOWEST_COUNT (int): Number of slowest images listed in the summary
+"""
+import contextlib
+import json
+import time
+
+try:
+    import resource
+except ImportError:
+    # Peak memory is not reported on platforms without the resource module.
+    resource = None
+
+TRACE_FILENAME = 'csv/profile.jsonl'
+SLOWEST_COUNT  = 5
+
+
+def peak_memory_mb():
+    """Peak resident memory in MB of this process or of its largest finished
+       worker process, whichever is higher, or None if unknown
+
+    The operating system only keeps a lifetime high-water mark, so this is
+    the peak of the whole run rather than of any one image.
+    """
+    if resource is None:
+        return None
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+class ImageTrace(object):
+    """Timings and sizes recorded for one image
+
+    total_s is the wall time from the first stage to finish(). In a pipeline
+    an image waits in the queues between its stages while other images are
+    worked on, so there wall_clock is turned off and total_s is the sum of
+    the stage times instead.
+    """
+
+    enabled = True
+
+    def __init__(self, file_path, wall_clock=True):
+        self.file_path  = file_path
+        self.wall_clock = wall_clock
+        self.stages     = {}
+        self.notes      = {}
+        self.start_time = None
+        self.total_s    = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times the body of a with statement as the named stage"""
+        if self.start_time is None:
+            self.start_time = time.time()
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start_time
+
+    def note(self, **values):
+        """Records sizes of the image, e.g. pixel or contour counts"""
+        self.notes.update(values)
+
+    def finish(self):
+        if self.wall_clock and self.start_time is not None:
+            self.total_s = time.time() - self.start_time
+        else:
+            self.total_s = sum(self.stages.values())
+
+    def to_dict(self):
+        record = {
+            'file':    self.file_path,
+            'total_s': self.total_s,
+            'stages':  self.stages,
+        }
+        record.update(self.notes)
+        return record
+
+
+class _NullTrace(object):
+    """Stands in for an ImageTrace when nothing is being profiled"""
+
+    enabled = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield
+
+    def note(self, **values):
+        pass
+
+    def finish(self):
+        pass
+
+NULL_TRACE = _NullTrace()
+
+
+class Profiler(object):
+    """Writes finished traces to a JSONL file and keeps the totals of a run"""
+
+    def __init__(self, filename=TRACE_FILENAME):
+        self.filename     = filename
+        self.trace_file   = open(filename, 'w')
+        self.records      = []
+        self.stage_totals = {}
+        self.start_time   = time.time()
+
+    def record(self, trace):
+        """Adds a finished ImageTrace to the trace file and the run totals"""
+        record = trace.to_dict()
+        self.trace_file.write(json.dumps(record) + '\n')
+        self.trace_file.flush()
+
+        self.records.append(record)
+        for stage, seconds in record['stages'].items():
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+
+    def progress(self, done, total):
+        """Throughput and estimated time left after done of total images
+
+        Returns:
+            string -- e.g. '2.31 img/s, ETA 0h:1m:12.00s'
+        """
+        elapsed    = time.time() - self.start_time
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        remaining  = (total - done) / throughput if throughput > 0 else 0.0
+
+        m, s = divmod(remaining, 60)
+        h, m = divmod(m, 60)
+        return '{0:.2f} img/s, ETA {1:d}h:{2:d}m:{3:.2f}s'.format(throughput, int(h), int(m), s)
+
+    def summary(self, slowest_count=SLOWEST_COUNT):
+        """Lists the stages by total time and the slowest images
+
+        Returns:
+            string -- The summary, ready to print.
+        """
+        lines = []
+        stage_sum = sum(self.stage_totals.values()) or 1.0
+
+        lines.append('{0:20} {1:>12} {2:>8}'.format('stage', 'total', 'share'))
+        for stage, seconds in sorted(self.stage_totals.items(), key=lambda item: -item[1]):
+            lines.append('{0:20} {1:>11.2f}s {2:>7.1f}%'.format(stage, seconds, seconds / stage_sum * 100))
+
+        lines.append('')
+        lines.append('Slowest images:')
+        slowest = sorted(self.records, key=lambda record: -(record['total_s'] or 0.0))[:slowest_count]
+        for record in slowest:
+            stage, seconds = max(record['stages'].items(), key=lambda item: item[1], default=('-', 0.0))
+            lines.append('{0:30} {1:>9.2f}s  slowest stage: {2} ({3:.2f}s)'.format(
+                record['file'][-30:], record['total_s'] or 0.0, stage, seconds))
+
+        peak_mb = peak_memory_mb()
+        if peak_mb is not None:
+            lines.append('')
+            lines.append(f'Peak memory of the run: {peak_mb:.1f} MB')
+
+        lines.append('')
+        lines.append(f'Trace written to {self.filename}')
+        return '\n'.join(lines)
+
+    def close(self):
+        self.trace_file.close()
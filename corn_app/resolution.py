@@ -0,0 +1,89 @@
+"""Reports how features drift when images are processed below full resolution
+Attributes:
+    FILENAME (str): Filename of the drift report csv file
+    HEADER (list(str)): Header of the drift report csv file
+"""
+from corn_app import feature
+import collections
+import csv
+import time
+
+FILENAME = 'csv/resolution_drift.csv'
+HEADER   = ['image filename', 'long edge', 'front facing kernel count', 'full resolution count',
+            'count drift %', 'avg width/height ratio', 'full resolution ratio', 'ratio drift %', 'seconds']
+
+drift_summary = collections.namedtuple('drift_summary',
+                                       'long_edge mean_count_drift max_count_drift mean_ratio_drift speedup')
+
+
+def percent_drift(value, reference):
+    """Absolute difference between a value and its full resolution reference, in percent"""
+    if reference == 0:
+        return 0.0 if value == 0 else 100.0
+    return abs((value - reference) / reference) * 100
+
+
+def timed_features(file, image, counting_method, long_edge):
+    """Extracts the features of a decoded image and times the extraction
+
+    Returns:
+        (Features, float) -- The features and the seconds taken.
+    """
+    start_time = time.time()
+    features   = feature.features_from_image(file, image, counting_method, None, long_edge)
+    return features, time.time() - start_time
+
+
+def drift_report(file_paths, counting_method, long_edges, filename=FILENAME):
+    """Processes each image at full resolution and at every working resolution
+       and writes how far the count and avg_w_h_ratio drift to a csv file.
+
+    Args:
+        file_paths (list(string)): The images to process.
+        counting_method (string) : The counting method used.
+        long_edges (list(int))   : The working resolutions to compare, as long
+            edges in pixels.
+        filename (string)        : The csv file the report is written to.
+    Returns:
+        list(drift_summary) -- Mean and worst drift and speedup of each long edge.
+    """
+    count_drifts = {long_edge: [] for long_edge in long_edges}
+    ratio_drifts = {long_edge: [] for long_edge in long_edges}
+    seconds      = {long_edge: 0.0 for long_edge in long_edges}
+    full_seconds = 0.0
+
+    with open(filename, 'w') as csvfile:
+        report_writer = csv.writer(csvfile)
+        report_writer.writerow(HEADER)
+
+        for file_path in file_paths:
+            file, image = feature.read_image(file_path)
+
+            full, elapsed = timed_features(file, image, counting_method, None)
+            full_seconds += elapsed
+            report_writer.writerow([file, 'full', full.count, full.count, 0.0,
+                                    full.avg_w_h_ratio, full.avg_w_h_ratio, 0.0, elapsed])
+
+            for long_edge in long_edges:
+                working, elapsed = timed_features(file, image, counting_method, long_edge)
+                count_drift = percent_drift(working.count, full.count)
+                ratio_drift = percent_drift(working.avg_w_h_ratio, full.avg_w_h_ratio)
+
+                count_drifts[long_edge].append(count_drift)
+                ratio_drifts[long_edge].append(ratio_drift)
+                seconds[long_edge] += elapsed
+
+                report_writer.writerow([file, long_edge, working.count, full.count, count_drift,
+                                        working.avg_w_h_ratio, full.avg_w_h_ratio, ratio_drift, elapsed])
+
+    summaries = []
+    for long_edge in long_edges:
+        image_count = max(1, len(count_drifts[long_edge]))
+        summaries.append(drift_summary(
+            long_edge        = long_edge,
+            mean_count_drift = sum(count_drifts[long_edge]) / image_count,
+            max_count_drift  = max(count_drifts[long_edge], default=0.0),
+            mean_ratio_drift = sum(ratio_drifts[long_edge]) / image_count,
+            speedup          = full_seconds / seconds[long_edge] if seconds[long_edge] else 0.0))
+
+    return summaries
@@ -0,0 +1,217 @@
+"""Serves kernel counts over HTTP while keeping the pipeline and model warm
+
+Start it with ``corn_app.py --serve -m <model>`` and POST the bytes of an
+image file to /count, optionally naming it with ?filename=<name>:
+
+    curl --data-binary @1_batch1.JPG 'http://127.0.0.1:8080/count?filename=1_batch1.JPG'
+
+The reply is JSON holding the predicted count and the extracted features.
+Images are processed by a pool of worker processes, and the predictions of
+requests arriving together are made in one batch. GET /health reports the
+loaded model.
+
+Attributes:
+    HOST (str): Default address the server listens on
+    PORT (int): Default port the server listens on
+    BATCH_SIZE (int): Most predictions made in one batch
+    BATCH_WINDOW (float): Seconds a prediction waits for others to join its batch
+"""
+from corn_app import feature
+from corn_app import parallel
+from corn_app import trainer
+import concurrent.futures
+import http.server
+import json
+import multiprocessing
+import os
+import queue
+import socketserver
+import threading
+import urllib.parse
+
+HOST         = '127.0.0.1'
+PORT         = 8080
+BATCH_SIZE   = 32
+BATCH_WINDOW = 0.005
+
+
+def _extract_bytes(data, filename, counting_method, long_edge):
+    """Extracts the features of an encoded image inside a worker process.
+
+    Returns:
+        Features class -- The features, or None if the bytes are not an image.
+    """
+    image = feature.decode_image(data)
+    if image is None:
+        return None
+    return feature.features_from_image(filename, image, counting_method, None, long_edge)
+
+
+class PredictionBatcher(object):
+    """Collects predictions requested by concurrent handlers and makes them
+       together, so a busy server calls the model once per batch.
+    """
+
+    def __init__(self, model, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW):
+        self.model        = model
+        self.batch_size   = batch_size
+        self.batch_window = batch_window
+        self.requests     = queue.Queue()
+        self.thread       = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def predict(self, features):
+        """Predicts the full kernel count of one ear, waiting for its batch"""
+        future = concurrent.futures.Future()
+        self.requests.put((features, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+
+            # Give requests arriving at the same time a moment to join.
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.requests.get(timeout=self.batch_window))
+            except queue.Empty:
+                pass
+
+            try:
+                counts = self.model.predict([features for features, _ in batch])
+                for (_, future), count in zip(batch, counts):
+                    future.set_result(count)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+class CountHandler(http.server.BaseHTTPRequestHandler):
+    """Answers /count and /health requests. The server holds the state."""
+
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path != '/health':
+            self._reply(404, {'error': 'Not found'})
+            return
+
+        self._reply(200, {'status': 'ok', 'model': self.server.model_name})
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/count':
+            self._reply(404, {'error': 'Not found'})
+            return
+
+        query           = urllib.parse.parse_qs(url.query)
+        filename        = query.get('filename', ['image'])[0]
+        counting_method = query.get('method', [self.server.counting_method])[0]
+
+        if counting_method not in feature.METHODS_DICT:
+            self._reply(400, {'error': f'Unknown counting method {counting_method}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self._reply(400, {'error': 'Invalid Content-Length'})
+            return
+
+        data = self.rfile.read(length) if length > 0 else b''
+        if not data:
+            self._reply(400, {'error': 'The request body is empty'})
+            return
+
+        try:
+            features = self.server.pool.apply_async(
+                _extract_bytes, (data, filename, counting_method, self.server.long_edge)).get()
+        except Exception as e:
+            self._reply(500, {'error': str(e)})
+            return
+
+        if features is None:
+            self._reply(400, {'error': 'The request body is not an image'})
+            return
+
+        count = self.server.batcher.predict(features)
+        self._reply(200, {
+            'filename':                  features.filename,
+            'count':                     count,
+            'front facing kernel count': features.count,
+            'avg width/height ratio':    features.avg_w_h_ratio,
+            'std width/height ratio':    features.std_w_h_ratio,
+            'mean kernel area':          features.mean_area,
+            'std kernel area':           features.std_area,
+            'ear coverage':              features.ear_coverage,
+        })
+
+    def _reply(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # Unix socket clients have no address to log.
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class _CountServerMixin(socketserver.ThreadingMixIn):
+    """Threaded server holding the worker pool, model and prediction batcher"""
+
+    daemon_threads = True
+
+    def setup_counting(self, model_name, counting_method, long_edge, workers):
+        self.model_name      = model_name
+        self.counting_method = counting_method
+        self.long_edge       = long_edge
+        self.batcher         = PredictionBatcher(trainer.load_model(model_name))
+        self.pool            = multiprocessing.Pool(workers, initializer=parallel._init_worker,
+                                                    initargs=(parallel.opencv_threads(workers), None))
+
+
+class CountServer(_CountServerMixin, http.server.HTTPServer):
+    pass
+
+
+class UnixCountServer(_CountServerMixin, socketserver.UnixStreamServer):
+    pass
+
+
+def serve(model_name, counting_method='otsu', host=HOST, port=PORT, socket_path=None,
+          workers=None, long_edge=feature.WORKING_LONG_EDGE):
+    """Runs the count server until it is interrupted
+
+    Args:
+        model_name (str)      : Name of the model used for predictions.
+        counting_method (str) : Default counting method of requests.
+        host (str)            : Address to listen on.
+        port (int)            : Port to listen on.
+        socket_path (str)     : Listens on this Unix socket instead of host and port.
+        workers (int)         : Number of worker processes. Defaults to one per CPU.
+        long_edge (int)       : Long edge in pixels images are processed at.
+    """
+    workers = workers or multiprocessing.cpu_count()
+
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server  = UnixCountServer(socket_path, CountHandler)
+        address = socket_path
+    else:
+        server  = CountServer((host, port), CountHandler)
+        address = f'http://{host}:{server.server_address[1]}'
+
+    server.setup_counting(model_name, counting_method, long_edge, workers)
+    print(f'Serving model {model_name} on {address} with {workers} workers')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.terminate()
+        server.pool.join()
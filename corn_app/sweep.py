@@ -0,0 +1,211 @@
+"""Evaluates a grid of pipeline parameters against the full kernel counts
+
+A grid is a JSON object mapping parameter names to the values to try, e.g.
+
+    {"block_size": [51, 71, 91], "erosion_kernel": [[12, 4], [8, 4]]}
+
+Parameters left out keep the value of the feature module constants. Each
+photo is decoded once and every intermediate is shared by the configurations
+that agree on its inputs: the HSV blur by every bound pair and erosion
+kernel, the mask by every block size and the contoured image by every
+counting setting. Photos are spread across worker processes.
+
+Configurations are compared by how well a linear model of their features
+predicts the full count in total_kernel_counts.csv, rather than by the raw
+front facing count. The error is measured on held out folds, and every
+configuration is scored on the same ears: those on which every
+configuration found contours. How many ears each configuration failed on
+is reported alongside.
+
+Attributes:
+    FILENAME (str): Default csv file the sweep results are written to
+    PARAMS (list(str)): Names of the parameters a grid may vary, in the
+        order the stages use them
+"""
+from corn_app import feature
+from corn_app import parallel
+from corn_app import trainer
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import numpy as np
+
+FILENAME = 'csv/sweep.csv'
+
+PARAMS = [
+    'lower_bound_yellow',
+    'upper_bound_yellow',
+    'erosion_kernel',
+    'block_size',
+    'mean_shift_radii',
+    'counting_method',
+]
+
+sweep_result = collections.namedtuple('sweep_result', 'config ears failures mae mape')
+
+
+def default_grid():
+    """Grid holding only the current value of each parameter"""
+    return {
+        'lower_bound_yellow': [list(feature.LOWER_BOUND_YELLOW)],
+        'upper_bound_yellow': [list(feature.UPPER_BOUND_YELLOW)],
+        'erosion_kernel':     [list(feature.EROSION_KERNEL)],
+        'block_size':         [feature.BLOCK_SIZE],
+        'mean_shift_radii':   [[feature.MEAN_SHIFT_SPATIAL_RADIUS, feature.MEAN_SHIFT_COLOR_RADIUS]],
+        'counting_method':    ['otsu'],
+    }
+
+
+def load_grid(filename):
+    """Reads a grid from a JSON file, filling in the parameters it leaves out
+
+    Raises:
+        ValueError: The grid names an unknown parameter or counting method.
+    """
+    with open(filename, 'r') as grid_file:
+        values = json.load(grid_file)
+
+    unknown = set(values) - set(PARAMS)
+    if unknown:
+        raise ValueError(f'Unknown sweep parameters: {", ".join(sorted(unknown))}')
+
+    grid = default_grid()
+    grid.update(values)
+
+    for counting_method in grid['counting_method']:
+        if counting_method not in feature.METHODS_DICT:
+            raise ValueError(f'Unknown counting method: {counting_method}')
+    return grid
+
+
+def configurations(grid):
+    """Every combination of the grid values, in the order sweep_image returns them
+
+    Returns:
+        list(dict) -- One dict of parameter values per configuration.
+    """
+    return [dict(zip(PARAMS, values)) for values in itertools.product(*[grid[name] for name in PARAMS])]
+
+
+def sweep_image(job):
+    """Extracts the features of one photo under every configuration of a grid
+
+    Args:
+        job (tuple): The photo's file path, the grid and the long edge.
+    Returns:
+        (string, list) -- The file name, and a (count, avg_w_h_ratio) pair per
+            configuration, or None where the configuration finds no contours.
+    """
+    file_path, grid, long_edge = job
+
+    file, image  = feature.read_image(file_path)
+    image, scale = feature.resize_to_working(image, long_edge)
+    blur         = feature.blur_hsv(image)
+    results      = []
+
+    for lower_bound, upper_bound, erosion_kernel in itertools.product(
+            grid['lower_bound_yellow'], grid['upper_bound_yellow'], grid['erosion_kernel']):
+        masked_image = feature.mask_blurred_hsv(image, blur, scale, lower_bound, upper_bound, erosion_kernel)
+        masked_image, roi = feature.crop_to_roi(masked_image, scale)
+
+        for block_size in grid['block_size']:
+            counting_settings = list(itertools.product(grid['mean_shift_radii'], grid['counting_method']))
+
+            # find_contours draws onto its input, so each block size gets a copy.
+            contour_results = feature.find_contours(masked_image.copy(), scale, block_size)
+            if contour_results.contour_count == 0:
+                results.extend([None] * len(counting_settings))
+                continue
+
+            # Counted on the uncropped image, like extract_features does.
+            contoured_image = feature.paste_to_frame(contour_results.image, roi)
+            for mean_shift_radii, counting_method in counting_settings:
+                count_results = feature.count_kernels(contoured_image, feature.METHODS_DICT[counting_method],
+                                                      scale, mean_shift_radii)
+                results.append((count_results.count, contour_results.avg_w_h_ratio))
+
+    return file, results
+
+
+def evaluate(configs, image_results, total_counts, folds=trainer.FOLDS):
+    """Scores each configuration by the cross-validated error of a linear
+       model of its features
+
+    Args:
+        configs (list(dict))     : The configurations of the grid.
+        image_results (list)     : (file name, results) pairs from sweep_image.
+        total_counts (dict)      : Full kernel count keyed by ear ID.
+        folds (int)              : Number of folds, fewer if there are fewer ears.
+    Returns:
+        list(sweep_result) -- One result per configuration, best first, all
+            scored on the ears every configuration found contours on. With
+            no more of those ears than features nothing can be fitted and
+            every configuration is scored None.
+    """
+    matched = [(total_counts[trainer.ear_id(file)], results) for file, results in image_results
+               if trainer.ear_id(file) in total_counts]
+    shared  = [(full_count, results) for full_count, results in matched if None not in results]
+    folds   = min(folds, len(shared))
+
+    scores = []
+    for i, config in enumerate(configs):
+        failures = sum(1 for _, results in matched if results[i] is None)
+
+        if len(shared) <= trainer.N:
+            scores.append(sweep_result(config, len(shared), failures, None, None))
+            continue
+
+        data   = np.array([(results[i][0], results[i][1], full_count) for full_count, results in shared],
+                          dtype=np.float64)
+        # The folds of one configuration are too small to be worth a pool.
+        result = trainer.cross_validate_data(data[:, :trainer.N], data[:, -1], folds, [('lstsq', {})], workers=1)[0]
+        scores.append(sweep_result(config, len(shared), failures, result.mae, result.mape))
+
+    return sorted(scores, key=lambda score: (score.mae is None, score.mae or 0.0))
+
+
+def format_value(value):
+    """Writes a parameter value as in the grid file, without quoting strings"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def run(file_paths, grid, workers=parallel.DEFAULT_WORKERS, long_edge=feature.WORKING_LONG_EDGE,
+        filename=FILENAME):
+    """Sweeps a grid over the photos and writes the score of each configuration
+
+    Args:
+        file_paths (list(string)): The photos to process.
+        grid (dict)              : Values to try for each parameter, see load_grid.
+        workers (int)            : Number of worker processes.
+        long_edge (int)          : Long edge in pixels photos are processed at.
+        filename (string)        : The csv file the results are written to.
+    Returns:
+        list(sweep_result) -- One result per configuration, best first.
+    """
+    configs = configurations(grid)
+    jobs    = [(file_path, grid, long_edge) for file_path in file_paths]
+
+    print(f'Sweeping {len(configs)} configurations over {len(file_paths)} photos')
+
+    if workers <= 1:
+        image_results = [sweep_image(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(workers, initializer=parallel._init_worker,
+                                    initargs=(parallel.opencv_threads(workers), None))
+        try:
+            image_results = pool.map(sweep_image, jobs)
+        finally:
+            pool.terminate()
+
+    scores = evaluate(configs, image_results, trainer.read_total_counts())
+
+    with open(filename, 'w') as csvfile:
+        sweep_writer = csv.writer(csvfile, delimiter='|', quotechar='/', quoting=csv.QUOTE_MINIMAL)
+        sweep_writer.writerow(PARAMS + ['ears', 'failed ears', 'mean absolute error', 'mean absolute percent error'])
+        for score in scores:
+            sweep_writer.writerow([format_value(score.config[name]) for name in PARAMS] +
+                                  [score.ears, score.failures, score.mae, score.mape])
+
+    return scores
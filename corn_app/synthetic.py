@@ -0,0 +1,61 @@
+"""Draws deterministic synthetic ears of corn for benchmarks and tests
+Attributes:
+    BACKGROUND_COLOR (tuple): BGR color behind the ear
+    COB_COLOR (tuple): BGR color showing between the kernels
+    KERNEL_COLOR (tuple): BGR color of the kernels, inside the yellow HSV range
+    KERNEL_SIZE (tuple): Width and height of a kernel on a 1000 pixel wide image
+"""
+import collections
+import cv2
+import numpy as np
+
+BACKGROUND_COLOR = (60, 70, 55)
+COB_COLOR        = (20, 50, 70)
+KERNEL_COLOR     = (40, 190, 225)
+KERNEL_SIZE      = (16, 22)
+
+ear_tuple = collections.namedtuple('ear_tuple', 'image kernel_count')
+
+
+def synthetic_ear(width, height, seed=0):
+    """Draws an ear of corn lying horizontally across the image
+
+    Args:
+        width (int) : Width of the image in pixels.
+        height (int): Height of the image in pixels.
+        seed (int)  : Seed of the jitter applied to the kernels and colors.
+    Returns:
+        Named tuple -- A tuple containing the image and the number of kernels drawn
+                       collections.namedtuple('ear_tuple','image kernel_count')
+    """
+    random = np.random.RandomState(seed)
+    image  = np.empty((height, width, 3), np.uint8)
+    image[:] = BACKGROUND_COLOR
+
+    center = (width // 2, height // 2)
+    axes   = (int(width * 0.42), int(height * 0.25))
+    cv2.ellipse(image, center, axes, 0, 0, 360, COB_COLOR, -1)
+
+    # Kernels are laid out in rows along the ear, sized relative to the image
+    # so every resolution shows the same ear.
+    scale        = width / 1000
+    kernel_w     = max(2, int(KERNEL_SIZE[0] * scale))
+    kernel_h     = max(2, int(KERNEL_SIZE[1] * scale))
+    step_x       = int(kernel_w * 2.4)
+    step_y       = int(kernel_h * 2.4)
+    kernel_count = 0
+
+    for y in range(center[1] - axes[1], center[1] + axes[1], step_y):
+        for x in range(center[0] - axes[0], center[0] + axes[0], step_x):
+            # Only keep kernels that lie well inside the ear.
+            if ((x - center[0]) / axes[0]) ** 2 + ((y - center[1]) / axes[1]) ** 2 > 0.8:
+                continue
+
+            jitter = random.randint(-2, 3, size=2)
+            shade  = random.randint(-15, 16)
+            color  = tuple(int(np.clip(channel + shade, 0, 255)) for channel in KERNEL_COLOR)
+            cv2.ellipse(image, (int(x + jitter[0]), int(y + jitter[1])),
+                        (kernel_w, kernel_h), 0, 0, 360, color, -1)
+            kernel_count += 1
+
+    return ear_tuple(image=image, kernel_count=kernel_count)
@@ -1,15 +1,105 @@
 from corn_app import csv_features
 from corn_app import feature
+from corn_app import feature_store
+from corn_app import predictor
+import collections
+import hashlib
 import numpy as np
-import tensorflow as tf
 import json
+import multiprocessing
 import os
 import csv
 
 
-MODELS_DIR = 'models'
-ITERATIONS = 1000
-N          = 2   # Number of features.
+MODELS_DIR     = predictor.MODELS_DIR
+ITERATIONS     = 1000
+N              = 2       # Number of features.
+LEARNING_RATE  = 0.1     # Size of step towards deepest gradient, on standardized features.
+TOLERANCE      = 1e-10   # Relative change of the fit at which gradient descent stops.
+MAX_ITERATIONS = 100000  # Passes gradient descent makes at most before the tolerance is met.
+
+STATS_SUFFIX  = '_stats.npz'
+
+FOLDS                 = 5
+SEARCH_LEARNING_RATES = [0.01, 0.1, 0.4]
+SEARCH_ITERATIONS     = [1000, MAX_ITERATIONS]
+
+TOTAL_COUNTS_FILENAME  = 'csv/total_kernel_counts.csv'
+DATASET_FILENAME       = 'csv/{model_name}_dataset.csv'
+DATASET_ARRAY_FILENAME = 'csv/{model_name}_dataset.npy'
+
+join_summary = collections.namedtuple('join_summary', 'rows unmatched_ids missing_ids')
+cv_result    = collections.namedtuple('cv_result', 'solver params fold_mae fold_mape mae mape')
+
+def restore_weights(model_name):
+    """
+    Restores the weights and basis of a model from its TensorFlow checkpoint
+
+    Args:
+        model_name(str): Name of the model
+    Returns:
+        (numpy array, numpy array): Weights shaped [N, 1] and basis shaped [1]
+    """
+    import tensorflow as tf  # Deferred so prediction and data set commands start quickly.
+
+    model_file = f'{model_name}-{ITERATIONS}.meta'
+
+    # A graph of its own, so restoring many models does not grow the default graph.
+    with tf.Graph().as_default():
+        try:
+            saver = tf.train.import_meta_graph(os.path.join(MODELS_DIR, model_name, model_file))
+        except Exception as e:
+            print(e)
+            exit(-1)
+
+        with tf.Session() as session:
+            # Load last training module
+            saver.restore(session, tf.train.latest_checkpoint(os.path.join(MODELS_DIR, model_name)))
+
+            W  = session.run("W:0")   # Load weights.
+            b  = session.run("b:0")   # Load basis.
+
+            return W, b
+
+def export_weights(model_name):
+    """
+    Exports the weights of a checkpointed model so predictor can use it without TensorFlow
+
+    Args:
+        model_name(str): Name of the model
+    Returns:
+        None
+    """
+    weight, basis = restore_weights(model_name)
+    predictor.save_weights(model_name, weight, basis)
+
+def load_model(model_name):
+    """
+    Loads a model once for repeated predictions, exporting its weights first
+    if it was trained before weight files existed
+
+    Args:
+        model_name(str): Name of the model
+    Returns:
+        predictor.Model: The loaded model
+    """
+    if not os.path.exists(predictor.weights_path(model_name)):
+        export_weights(model_name)
+
+    return predictor.Model.load(model_name)
+
+def get_counts(model_name, features_list):
+    """
+    Predicts the full kernel count of many ears with a single model load
+
+    Args:
+        model_name(str)              : Name of the model
+        features_list(list(Features)): The features of each ear
+
+    Returns:
+        list(int): The predicted full kernel count of each ear
+    """
+    return load_model(model_name).predict(features_list)
 
 #expects float as param
 def get_count(model_name, features):
@@ -17,198 +107,538 @@ def get_count(model_name, features):
     Uses last trained model to predict the full kernel count
 
     Args:
-        front_count(int): This is the count determined by the watershed/otsu method in the contours module
-        ratio(float)    : 
+        model_name(str)  : Name of the model
+        features(Features): The features of the ear
 
     Returns:
         full_count(int): This is the predicted full kernel count calculated by our last trained model
     """
-    last_training_dir = f'{len(os.listdir(MODELS_DIR))}'
-    model_file        = f'{model_name}-{ITERATIONS}.meta'
+    return get_counts(model_name, [features])[0]
+
+def ear_id(filename):
+    """Leading integer of a photo file name, e.g. 1 for '1_batch1 copy.JPG'
 
+    Returns:
+        int -- The ear ID, or None if the file name does not start with one.
+    """
     try:
-        saver = tf.train.import_meta_graph(os.path.join(MODELS_DIR, model_name, model_file))
-    except Exception as e:
-        print(e)
-        exit(-1)
+        return int(filename.split('_')[0])
+    except ValueError:
+        return None
 
-    with tf.Session() as session:
-        # Load last training module
-        saver.restore(session, tf.train.latest_checkpoint(os.path.join(MODELS_DIR, model_name)))
+def index_total_counts(total_count_reader):
+    """
+    Indexes the full kernel count of each ear by its ID
 
-        x  = tf.placeholder(tf.float32,[None,N])
-        W  = session.run("W:0")   # Load weights.
-        b  = session.run("b:0")   # Load basis.
-        y  = tf.matmul(x, W) + b  # Machine learning model.
+    Args:
+        total_count_reader(csv reader): Rows of total_kernel_counts.csv, past the header
+    Returns:
+        dict -- Full kernel count keyed by ear ID.
+    """
+    total_counts = {}
+    for total_count_row in total_count_reader:
+        total_counts[int(total_count_row[0])] = int(total_count_row[3])
+    return total_counts
 
-        # Generate full count.
-        feed = {x: [[features.count, features.avg_w_h_ratio]]}
-        full_count = session.run(y, feed_dict=feed)
-        full_count = int(full_count[0][0])
+def read_features():
+    """
+    Reads the extracted features, from the feature store when it exists
 
-        return full_count
+    Returns:
+        (list(str), numpy array, numpy array): The file name, front facing
+            kernel count and average width/height ratio of each photo.
+    """
+    if feature_store.exists():
+        table = feature_store.load()
+        return table.filenames, table.columns['count'], table.columns['avg_w_h_ratio']
+
+    # Features extracted before the feature store existed are only in the csv file.
+    with open(csv_features.FILENAME, 'r') as feature_file:
+        feature_reader = csv.reader(feature_file, delimiter=csv_features.DELIM, quotechar=csv_features.QUOTECHAR, quoting=csv.QUOTE_MINIMAL)
+        next(feature_reader)
+        rows = list(feature_reader)
+
+    return ([row[0] for row in rows],
+            np.array([int(row[1]) for row in rows], dtype=np.int64),
+            np.array([float(row[2]) for row in rows], dtype=np.float64))
+
+def read_total_counts(filename=TOTAL_COUNTS_FILENAME):
+    """
+    Reads total_kernel_counts.csv into an index of full kernel counts
+
+    Returns:
+        dict -- Full kernel count keyed by ear ID.
+    """
+    with open(filename, 'r') as total_count_file:
+        total_count_reader = csv.reader(total_count_file, delimiter=',', quotechar='/', quoting=csv.QUOTE_MINIMAL)
+
+        # Call next() to skip past header row.
+        next(total_count_reader)
+        return index_total_counts(total_count_reader)
 
 def generate_training_set(model_name):
     """Place's each corn photo's features and final kernel count on a row
-        in dataset.csv
+        in dataset.csv, and in dataset.npy for training
+
+    The full kernel counts are indexed by ear ID, so the features are read
+    once, in any order, and an ear may have several photos.
 
     Args:
-        None
+        model_name(str): Name of the model the data set is created for
     Returns:
-        None
+        join_summary -- The number of rows written, the ear IDs of photos
+            without a full kernel count and the ear IDs without any photo.
     """
     try:
-        feature_file     = open(csv_features.FILENAME, 'r')
-        total_count_file = open('csv/total_kernel_counts.csv', 'r')
-        data_file        = open(f'csv/{model_name}_dataset.csv', 'w+')
+        filenames, front_counts, w_h_ratios = read_features()
+        total_count_file = open(TOTAL_COUNTS_FILENAME, 'r')
+        data_file        = open(DATASET_FILENAME.format(model_name=model_name), 'w+')
     except IOError as e:
         print(e)
         exit(-1)
 
-    feature_reader     = csv.reader(feature_file, delimiter='|', quotechar='/', quoting=csv.QUOTE_MINIMAL)
     total_count_reader = csv.reader(total_count_file , delimiter=',', quotechar='/', quoting=csv.QUOTE_MINIMAL)
     data_writer        = csv.writer(data_file,    delimiter=',', quotechar='/', quoting=csv.QUOTE_MINIMAL)
 
     # Call next() to skip past header row.
-    next(feature_reader)
     next(total_count_reader)
 
-    # Get first data row of csv file.
-    feature_row     = next(feature_reader)
-    total_count_row = next(total_count_reader)
+    total_counts   = index_total_counts(total_count_reader)
+    full_counts    = np.zeros(len(filenames), dtype=np.int64)
+    matched        = np.zeros(len(filenames), dtype=bool)
+    photographed   = set()
+    unmatched_ids  = set()
 
-    feature_file_end_reached = False;
-
-    while not feature_file_end_reached:
+    for row, filename in enumerate(filenames):
         # Get leading integer of file name. e.i '1_batch1 copy.JPG'
-        corn_feature_id = int(feature_row[0].split('_')[0])
-        corn_total_id   = int(total_count_row[0])
-
-        # Seek the absolute reader to the current corn feature id
-        while corn_total_id < corn_feature_id:
-            try:
-                total_count_row = next(total_count_reader)
-                corn_total_id   = int(total_count_row[0])
-            except StopIteration:
-                # Consumed all rows in the absolute_features.csv file.
-                # This means we're training a corn id we do not have a final count
-                # for. The program will be terminated.
-                print(f"Final kernel count does not exist for corn ID: {corn_feature_id}.")
-                print("Training will now terminate.")
-                feature_file.close()
-                total_count_file.close()
-                data_file.close()
-                exit(-1)
-
-        # Extract features and the full kernel count from the csv files.
-        front_count = int(feature_row[1])
-        w_h_ratio   = float(feature_row[2])
-        full_count  = int(total_count_row[3])
-
-        # Write the features and full kernel count to the data file
-        # only if the features seem reasonable.
-        if front_count < full_count:
-            data_writer.writerow([front_count, w_h_ratio, full_count])
+        corn_feature_id = ear_id(filename)
 
-        try:
-            # Repeat process for the next image in feature_reader.
-            feature_row = next(feature_reader)
-        except:
-            # Reached the end of the feature file, stop iteration.
-            feature_file_end_reached = True
+        if corn_feature_id not in total_counts:
+            unmatched_ids.add(filename if corn_feature_id is None else corn_feature_id)
+            continue
+
+        photographed.add(corn_feature_id)
+        full_counts[row] = total_counts[corn_feature_id]
+        matched[row]     = True
+
+    # Keep the features and full kernel count only if the features seem reasonable.
+    keep = matched & (front_counts < full_counts)
+    data = np.column_stack([front_counts[keep], w_h_ratios[keep], full_counts[keep]]).astype(np.float64)
+
+    for front_count, w_h_ratio, full_count in zip(front_counts[keep].tolist(), w_h_ratios[keep].tolist(), full_counts[keep].tolist()):
+        data_writer.writerow([front_count, w_h_ratio, full_count])
+
+    np.save(DATASET_ARRAY_FILENAME.format(model_name=model_name), data)
 
-    feature_file.close()
     total_count_file.close()
     data_file.close()
 
-def train(model_name):
-    '''
-    Trains our counting model with datapoints from dataset.csv
+    # Photos whose names hold no ear ID are reported by file name after the IDs.
+    unmatched_ids = sorted(i for i in unmatched_ids if isinstance(i, int)) + \
+                    sorted(i for i in unmatched_ids if isinstance(i, str))
+    summary       = join_summary(len(data), unmatched_ids, sorted(set(total_counts) - photographed))
+
+    if summary.unmatched_ids:
+        print(f"Final kernel count does not exist for corn IDs: {', '.join(str(i) for i in summary.unmatched_ids)}.")
+    if summary.missing_ids:
+        print(f"No photos found for {len(summary.missing_ids)} corn IDs with a final kernel count.")
+
+    return summary
+
+def load_dataset(model_name):
+    """
+    Reads the rows of <model_name>_dataset into feature and target arrays.
+    The binary data set is memory mapped when it is at least as new as the
+    csv file, otherwise the csv file, which may have been edited, is parsed.
 
     Args:
-        None
+        model_name(str): Name of the model whose data set is loaded
     Returns:
-        None
-    '''
-
-    if model_name in os.listdir(MODELS_DIR):
-        # Choose how to handle.
-        # Possibly alert user.
-        pass
-    
+        (numpy array, numpy array): The features, one row per ear, and the
+                                    final kernel count of each ear
+    """
+    array_file = DATASET_ARRAY_FILENAME.format(model_name=model_name)
+    csv_file   = DATASET_FILENAME.format(model_name=model_name)
 
     try:
-        data = np.genfromtxt(f'csv/{model_name}_dataset.csv', delimiter=',')
+        if os.path.exists(array_file) and (not os.path.exists(csv_file) or
+                                           os.path.getmtime(array_file) >= os.path.getmtime(csv_file)):
+            data = feature_store.load_array(array_file)
+        else:
+            data = np.genfromtxt(csv_file, delimiter=',')
         if len(data) == 0:
-            print(f'Error: {model_name}_dataset.csv contains no data.')
+            print(f'Error: {model_name}_dataset contains no data.')
             exit(-1)
     except IOError as e:
         print(e)
         exit(-1)
 
-    # When any dataset.csv only has one entry, np.genfrontxt will return a
-    # list instead of a matrix, which will cause this function to fail. data
-    # will be wrapped inside a list if it is one-dimensional.
+    # When any dataset.csv only has one entry, np.genfromtxt will return a
+    # one-dimensional array instead of a matrix.
+    data = np.atleast_2d(data)
+
+    return data[:, :N], data[:, -1]
+
+def least_squares(x_data, y_data):
+    """
+    Solves for the weights and basis minimizing the squared error in closed form
+
+    Args:
+        x_data(numpy array): Features, one row per ear
+        y_data(numpy array): Final kernel count of each ear
+    Returns:
+        (numpy array, numpy array): Weights shaped [N, 1] and basis shaped [1]
+    """
+    design   = np.hstack([x_data, np.ones((len(x_data), 1))])
+    solution = np.linalg.lstsq(design, y_data, rcond=-1)[0]
+
+    return solution[:-1].reshape(-1, 1), solution[-1:]
+
+def gradient_descent(x_data, y_data, learning_rate=LEARNING_RATE, iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """
+    Minimizes the mean squared error with full-batch gradient descent
+
+    The features are standardized first. The kernel count is hundreds of
+    times the width/height ratio, so on the raw features any step small
+    enough for the count weight barely moves the ratio weight and the
+    basis. Standardized, the fit converges to the least squares solution.
+
+    Args:
+        x_data(numpy array) : Features, one row per ear
+        y_data(numpy array) : Final kernel count of each ear
+        learning_rate(float): Size of step towards deepest gradient
+        iterations(int)     : Most passes over the whole data set
+        tolerance(float)    : Stops once no weight changes by more than this
+                              fraction of the largest weight
+    Returns:
+        (numpy array, numpy array): Weights shaped [N, 1] and basis shaped [1]
+    """
+    mean      = x_data.mean(axis=0)
+    deviation = x_data.std(axis=0)
+    deviation[deviation == 0] = 1.0
+
+    standard = (x_data - mean) / deviation
+    y_data   = y_data.reshape(-1, 1)
+    weight   = np.zeros((x_data.shape[1], 1))
+    basis    = np.zeros(1)
+
+    for i in range(iterations):
+        residual = y_data - (standard @ weight + basis)  # Gradient of the squared error is -2 * residual.
+        step     = learning_rate * 2 * (standard.T @ residual) / len(x_data)
+        weight  += step
+        basis   += learning_rate * 2 * residual.mean()
+
+        if np.abs(step).max() <= tolerance * max(1.0, np.abs(weight).max()):
+            break
+
+    # Back to weights of the raw features.
+    weight = weight / deviation.reshape(-1, 1)
+    return weight, basis - mean @ weight
+
+def search_space(learning_rates=SEARCH_LEARNING_RATES, iterations=SEARCH_ITERATIONS):
+    """
+    Lists the solver configurations cross_validate compares
+
+    Returns:
+        list((str, dict)): Key of SOLVERS and the keyword arguments of the solver
+    """
+    configs = [('lstsq', {})]
+    for learning_rate in learning_rates:
+        for iteration_count in iterations:
+            configs.append(('gradient', {'learning_rate': learning_rate, 'iterations': iteration_count}))
+    return configs
+
+def fold_indices(rows, folds=FOLDS, seed=0):
+    """
+    Shuffles the rows of a data set into folds of nearly equal size
+
+    Returns:
+        list(numpy array): The row indices held out by each fold
+    """
+    return np.array_split(np.random.RandomState(seed).permutation(rows), folds)
+
+def fit_fold(job):
+    """
+    Fits one solver configuration on the training rows of a fold and scores
+    it on the held out rows. Runs in a worker process.
+
+    Args:
+        job(tuple): Solver key, solver arguments, training features, training
+                    counts, held out features and held out counts
+    Returns:
+        (float, float): Mean absolute error and mean absolute percent error
+                        on the held out rows, infinite if the fit diverged
+    """
+    solver, params, x_train, y_train, x_test, y_test = job
+
+    # Too large a learning rate makes gradient descent overflow.
+    with np.errstate(all='ignore'):
+        weight, basis = SOLVERS[solver](x_train, y_train, **params)
+        errors        = np.abs(x_test @ weight[:, 0] + basis[0] - y_test)
+
+    if not np.all(np.isfinite(errors)):
+        return float('inf'), float('inf')
+    return float(errors.mean()), float((errors / y_test).mean() * 100)
+
+def cross_validate(model_name, folds=FOLDS, configs=None, workers=None):
+    """
+    Scores solver configurations with k-fold cross-validation on the data
+    set of a model, fitting the folds in a process pool
+
+    Args:
+        model_name(str)          : Name of the model whose data set is used
+        folds(int)               : Number of folds, at least 2
+        configs(list((str,dict))): Configurations to compare. Defaults to search_space()
+        workers(int)             : Number of worker processes. Defaults to one per CPU
+    Returns:
+        list(cv_result): The score of each configuration, best first
+    """
+    # A single fold leaves no rows to fit on.
+    if folds < 2:
+        print('Error: Cross-validation needs at least 2 folds.')
+        exit(-1)
+
+    x_data, y_data = load_dataset(model_name)
+
+    if len(x_data) < folds:
+        print(f'Error: {model_name}_dataset has fewer rows than folds.')
+        exit(-1)
+
+    return cross_validate_data(np.asarray(x_data), np.asarray(y_data), folds, configs, workers)
+
+def cross_validate_data(x_data, y_data, folds=FOLDS, configs=None, workers=None):
+    """
+    Scores solver configurations with k-fold cross-validation on features
+    and counts already in memory, e.g. those of a parameter sweep
+
+    Args:
+        x_data(numpy array)      : Features, one row per ear. At least one row per fold
+        y_data(numpy array)      : Final kernel count of each ear
+        folds(int)               : Number of folds
+        configs(list((str,dict))): Configurations to compare. Defaults to search_space()
+        workers(int)             : Number of worker processes. Defaults to one per CPU
+    Returns:
+        list(cv_result): The score of each configuration, best first
+    """
+    configs = search_space() if configs is None else configs
+    workers = workers or multiprocessing.cpu_count()
+
+    jobs = []
+    for solver, params in configs:
+        for held_out in fold_indices(len(x_data), folds):
+            train_rows           = np.ones(len(x_data), dtype=bool)
+            train_rows[held_out] = False
+            jobs.append((solver, params, x_data[train_rows], y_data[train_rows], x_data[held_out], y_data[held_out]))
+
+    if workers <= 1:
+        scores = [fit_fold(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            scores = pool.map(fit_fold, jobs)
+        finally:
+            pool.terminate()
+
+    results = []
+    for i, (solver, params) in enumerate(configs):
+        fold_scores = scores[i * folds:(i + 1) * folds]
+        fold_mae    = [mae for mae, _ in fold_scores]
+        fold_mape   = [mape for _, mape in fold_scores]
+        results.append(cv_result(solver, params, fold_mae, fold_mape,
+                                 float(np.mean(fold_mae)), float(np.mean(fold_mape))))
+
+    return sorted(results, key=lambda result: result.mae)
+
+def sufficient_statistics(x_data, y_data):
+    """
+    Sums the products least squares needs, so rows can be folded into a
+    model one batch at a time
+
+    Args:
+        x_data(numpy array): Features, one row per ear
+        y_data(numpy array): Final kernel count of each ear
+    Returns:
+        (numpy array, numpy array): The Gram matrix of the features with a
+                                    column of ones, shaped [N + 1, N + 1], and
+                                    their product with the counts, shaped [N + 1]
+    """
+    design = np.hstack([x_data, np.ones((len(x_data), 1))])
+    return design.T @ design, design.T @ y_data
+
+def solve_statistics(gram, moment):
+    """
+    Solves the normal equations of the sufficient statistics
+
+    Returns:
+        (numpy array, numpy array): Weights shaped [N, 1] and basis shaped [1]
+    """
+    solution = np.linalg.lstsq(gram, moment, rcond=-1)[0]
+
+    return solution[:-1].reshape(-1, 1), solution[-1:]
+
+def row_hashes(x_data, y_data):
+    """
+    Hashes each row of a data set, so incremental training can tell which
+    rows a model has already seen
+
+    Returns:
+        numpy array: A 64 bit hash per row
+    """
+    rows = np.ascontiguousarray(np.column_stack([x_data, y_data]), dtype=np.float64)
+    return np.array([int.from_bytes(hashlib.sha1(row.tobytes()).digest()[:8], 'little') for row in rows],
+                    dtype=np.uint64)
+
+def unseen_rows(hashes, seen_hashes):
+    """
+    Finds the rows of a data set that were not folded into a model yet
+
+    Args:
+        hashes(numpy array)     : Hash of each row of the data set
+        seen_hashes(numpy array): Hashes of the rows already folded in
+    Returns:
+        numpy array: A mask of the new rows, or None if rows the model has
+                     seen are no longer in the data set
+    """
+    seen   = collections.Counter(seen_hashes.tolist())
+    unseen = np.zeros(len(hashes), dtype=bool)
+
+    for i, row_hash in enumerate(hashes.tolist()):
+        if seen[row_hash] > 0:
+            seen[row_hash] -= 1
+        else:
+            unseen[i] = True
+
+    if any(seen.values()):
+        return None
+    return unseen
+
+def stats_path(model_name):
+    """Path of the sufficient statistics saved alongside a model"""
+    return os.path.join(MODELS_DIR, model_name, f'{model_name}{STATS_SUFFIX}')
+
+def save_statistics(model_name, gram, moment, hashes):
+    os.makedirs(os.path.join(MODELS_DIR, model_name), exist_ok=True)
+    np.savez(stats_path(model_name), gram=gram, moment=moment, hashes=hashes)
+
+def load_statistics(model_name):
+    """
+    Loads the sufficient statistics of a model
+
+    Returns:
+        (numpy array, numpy array, numpy array): The Gram matrix, moment and
+            row hashes, or None if the model has no statistics
+    """
     try:
-        # Check if a second row can be accessed.
-        data[1][0]
-    except IndexError:
-        # Wrap data in list if the second row does not exist.
-        data = [data]
+        with np.load(stats_path(model_name)) as stats:
+            return stats['gram'], stats['moment'], stats['hashes']
+    except IOError:
+        return None
+
+# The keys are valid inputs for the solver argument of train
+SOLVERS = {
+    'lstsq':    least_squares,
+    'gradient': gradient_descent
+}
+
+def save_model(model_name, weight, basis):
+    """
+    Writes the weights and basis to a checkpoint that get_count can restore
+
+    Args:
+        model_name(str)    : Name of the model
+        weight(numpy array): Weights shaped [N, 1]
+        basis(numpy array) : Basis shaped [1]
+    Returns:
+        None
+    """
+    import tensorflow as tf  # Deferred so prediction and data set commands start quickly.
+
+    # A graph of its own, so saving many models does not grow the default graph.
+    with tf.Graph().as_default():
+        W = tf.Variable(weight.astype(np.float32), name="W")
+        b = tf.Variable(basis.astype(np.float32),  name="b")
+
+        with tf.Session() as session:
+            session.run(tf.global_variables_initializer())
+
+            # Make folder is MODELS_DIR
+            dir_count          = len(os.listdir(MODELS_DIR))
+            current_model_dir  = dir_count + 1 #saving dir name as number. Will be using last trained model to get a full count
+
+            os.makedirs(f'models/{current_model_dir}')
+
+            tf.train.Saver().save(session, os.path.join(MODELS_DIR, model_name, model_name), global_step=ITERATIONS)
 
-    x  = tf.placeholder(tf.float32,[None,N])     # Placeholder for N features.
-    y_ = tf.placeholder(tf.float32, [None, 1])   # Placeholder for final kernel count.
-    W  = tf.Variable(tf.zeros([N,1]), name="W")  # Training for n weights to minimize cost function.
-    b  = tf.Variable(tf.zeros([1]),   name="b")  # Training for a b to minimize cost function.
-    y  = tf.matmul(x, W) + b                     # Machine learning model.
+    predictor.save_weights(model_name, weight, basis)
 
-    cost          = tf.reduce_sum(tf.pow((y_ - y), 2)) # Cost function.
-    learning_rate = 0.00001                            # Size of step towards deepest gradient.
-    train_step    = tf.train.GradientDescentOptimizer(learning_rate).minimize(cost)
+def train(model_name, solver='lstsq', incremental=False, solver_params=None):
+    '''
+    Trains our counting model with datapoints from dataset.csv
+
+    The sufficient statistics of the data set are saved with the model. An
+    incremental run folds only the rows added since into them and solves
+    the least squares problem again, giving the model a full lstsq retrain
+    would. If rows the model has seen were removed or changed, it retrains
+    on the whole data set instead.
 
-    init = tf.global_variables_initializer()
+    Args:
+        model_name(str)  : Name of the model to train
+        solver(str)      : Key of SOLVERS used to fit the model
+        incremental(bool): Folds new rows into the saved statistics instead
+                           of fitting the whole data set. Needs the lstsq solver.
+        solver_params(dict): Keyword arguments of the solver, e.g. the
+                           learning rate picked by cross_validate
+    Returns:
+        None
+    '''
 
-    with tf.Session() as session:
+    if model_name in os.listdir(MODELS_DIR):
+        # Choose how to handle.
+        # Possibly alert user.
+        pass
 
-        session.run(init)
-        x_data = None
-        y_data = None
+    if incremental and solver != 'lstsq':
+        print(f"Error: incremental training needs the lstsq solver, not {solver}.")
+        exit(-1)
 
-        for i in range(1, ITERATIONS + 1):
-            for row in data:
-                x_data = [row[:N]]    # [ [feature 1, feature 2, feature n] ]
-                y_data = [[row[-1]]]  # [ [ final kernel count ] ]
-                feed = {x: x_data, y_: y_data}
-                session.run(train_step, feed_dict=feed)
+    x_data, y_data = load_dataset(model_name)
+    hashes         = row_hashes(x_data, y_data)
+    stats          = load_statistics(model_name) if incremental else None
+    unseen         = unseen_rows(hashes, stats[2]) if stats is not None else None
 
-        print("\nTraining Finished!")
+    if unseen is not None:
+        if not unseen.any():
+            print(f"Model {model_name} has seen every row of the data set.")
+            return
 
-        # Fetch the trained values
-        basis  = (session.run(b))
-        weight = (session.run(W))
+        print(f"Folding {int(unseen.sum())} new rows into model {model_name}.")
+        gram, moment  = sufficient_statistics(x_data[unseen], y_data[unseen])
+        gram, moment  = stats[0] + gram, stats[1] + moment
+        weight, basis = solve_statistics(gram, moment)
+    else:
+        if incremental:
+            print(f"Model {model_name} has no statistics for these rows, retraining on the whole data set.")
+        gram, moment  = sufficient_statistics(x_data, y_data)
+        weight, basis = SOLVERS[solver](x_data, y_data, **(solver_params or {}))
 
-        # Display to the user the trained values.
-        print('=' * 20)
-        print(f"Front facing kernel count weight: {weight[0][0]} ")
-        print(f"Avg kernel w/h ratio weight:      {weight[1][0]} ")
-        print(f"Basis:                            {basis[0]}   ")
-        print('=' * 20)
-        
-        print("Saving trained model...\n")
+    print("\nTraining Finished!")
 
-        # Make folder is MODELS_DIR
-        dir_count          = len(os.listdir(MODELS_DIR))
-        current_model_dir  = dir_count + 1 #saving dir name as number. Will be using last trained model to get a full count
-        ##model_name         = 'kernel_prediction_model'
+    # Display to the user the trained values.
+    print('=' * 20)
+    print(f"Front facing kernel count weight: {weight[0][0]} ")
+    print(f"Avg kernel w/h ratio weight:      {weight[1][0]} ")
+    print(f"Basis:                            {basis[0]}   ")
+    print('=' * 20)
 
-        os.makedirs(f'models/{current_model_dir}')
+    print("Saving trained model...\n")
 
-        tf.train.Saver().save(session, os.path.join(MODELS_DIR, model_name, model_name), global_step=ITERATIONS)
+    save_model(model_name, weight, basis)
+    save_statistics(model_name, gram, moment, hashes)
 
-        print("Trained model has been saved.\n")
+    print("Trained model has been saved.\n")
 
 def main():
     generate_training_set()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
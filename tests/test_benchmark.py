@@ -0,0 +1,32 @@
+import unittest
+import sys
+import tempfile
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import benchmark
+from corn_app import synthetic
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_synthetic_ear_is_deterministic(self):
+        first  = synthetic.synthetic_ear(320, 240, seed=3)
+        second = synthetic.synthetic_ear(320, 240, seed=3)
+
+        self.assertTrue((first.image == second.image).all())
+        self.assertEqual(first.kernel_count, second.kernel_count)
+        self.assertTrue(first.kernel_count > 0)
+
+    def test_image_stages(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = benchmark.bench_image_stages(320, 240, 1, work_dir)
+
+        stages = [result['stage'] for result in results]
+        self.assertEqual(stages, ['mask_yellow', 'find_contours', 'otsu_method', 'watershed_method', 'extract_features'])
+
+        for result in results:
+            self.assertEqual(result['resolution'], '320x240')
+            self.assertTrue(result['min_s'] <= result['median_s'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import cache
+from corn_app import feature
+
+
+class TestCache(unittest.TestCase):
+
+    def test_extract_all_runs_the_extractor_to_its_end(self):
+        finished = []
+
+        def extractor(file_paths):
+            for file_path in file_paths:
+                yield feature.Features(os.path.basename(file_path), 10, 1.0)
+            # Where parallel.extract_all joins its workers.
+            finished.append(True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            photo = os.path.join(directory, '1_a.png')
+            with open(photo, 'wb') as photo_file:
+                photo_file.write(b'photo')
+
+            feature_cache = cache.FeatureCache(os.path.join(directory, 'cache'))
+            results       = cache.extract_all([photo], 'otsu', directory, extractor, feature_cache)
+
+            self.assertEqual(next(results).filename, '1_a.png')
+            self.assertEqual(list(results), [])
+            self.assertEqual(finished, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import sys
+import cv2
+import numpy as np
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import feature
+from corn_app import synthetic
+
+
+class TestContourStatistics(unittest.TestCase):
+
+    def test_matches_per_contour_opencv(self):
+        masked   = feature.mask_yellow(synthetic.synthetic_ear(1200, 800).image)
+        contours = feature.find_contours(masked).contours
+
+        ratios = [w / h for x, y, w, h in map(cv2.boundingRect, contours)]
+        areas  = [cv2.contourArea(c) for c in contours]
+
+        avg_w_h_ratio, stats = feature.contour_statistics(contours, 0.5, sum(areas))
+
+        # The ratio the models were trained on is unchanged.
+        self.assertEqual(avg_w_h_ratio, sum(ratios) / len(contours))
+        self.assertAlmostEqual(stats.std_w_h_ratio, np.std(ratios))
+        self.assertAlmostEqual(stats.mean_area, np.mean(areas) * 4)
+        self.assertAlmostEqual(stats.std_area, np.std(areas) * 4)
+        self.assertAlmostEqual(stats.ear_coverage, 1.0)
+
+    def test_image_without_contours(self):
+        result = feature.find_contours(np.zeros((60, 80, 3), np.uint8))
+
+        self.assertEqual(result.contour_count, 0)
+        self.assertEqual(result.avg_w_h_ratio, 0.0)
+        self.assertEqual(result.stats.ear_coverage, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import sys
+import time
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_clock_starts_with_the_first_stage(self):
+        trace = profiler.ImageTrace('1_a.JPG')
+        time.sleep(0.2)
+        with trace.stage('decode'):
+            pass
+        trace.finish()
+
+        self.assertLess(trace.total_s, 0.1)
+
+    def test_pipeline_total_is_the_sum_of_the_stages(self):
+        trace = profiler.ImageTrace('1_a.JPG', wall_clock=False)
+        with trace.stage('decode'):
+            pass
+        # Time spent waiting in a queue between stages.
+        time.sleep(0.2)
+        with trace.stage('count'):
+            pass
+        trace.finish()
+
+        self.assertEqual(trace.total_s, sum(trace.stages.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import cv2
+import numpy as np
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import feature
+from corn_app import synthetic
+
+
+class TestRoi(unittest.TestCase):
+
+    def test_cropping_does_not_change_the_features(self):
+        ear   = synthetic.synthetic_ear(1200, 800).image
+        image = cv2.copyMakeBorder(ear, 400, 400, 600, 600, cv2.BORDER_CONSTANT, value=0)
+
+        for counting_method in feature.METHODS_DICT:
+            cropped = feature.features_from_image('1_padded.png', image.copy(), counting_method, None)
+
+            margin = feature.ROI_MARGIN
+            try:
+                feature.ROI_MARGIN = None
+                uncropped = feature.features_from_image('1_padded.png', image.copy(), counting_method, None)
+            finally:
+                feature.ROI_MARGIN = margin
+
+            self.assertEqual(cropped.to_list(), uncropped.to_list())
+
+    def test_cropping_does_not_change_the_count_of_a_noisy_ear(self):
+        # Mean shift on an image pyramid depends on where the image starts,
+        # so an odd, off-centre crop of a noisy ear is the hard case.
+        ear   = synthetic.synthetic_ear(600, 400, seed=2).image
+        noise = np.random.RandomState(2).normal(0, 12, ear.shape)
+        ear   = np.clip(ear + noise, 0, 255).astype(np.uint8)
+        image = cv2.copyMakeBorder(ear, 139, 211, 253, 65, cv2.BORDER_CONSTANT, value=0)
+
+        for counting_method in feature.METHODS_DICT:
+            cropped = feature.features_from_image('2_noisy.png', image.copy(), counting_method, None)
+
+            margin = feature.ROI_MARGIN
+            try:
+                feature.ROI_MARGIN = None
+                uncropped = feature.features_from_image('2_noisy.png', image.copy(), counting_method, None)
+            finally:
+                feature.ROI_MARGIN = margin
+
+            self.assertEqual(cropped.to_list(), uncropped.to_list())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import cv2
+import tempfile
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import feature
+from corn_app import sweep
+from corn_app import synthetic
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_shared_intermediates_match_the_pipeline(self):
+        grid = sweep.default_grid()
+        grid['block_size']     = [51, feature.BLOCK_SIZE]
+        grid['erosion_kernel'] = [[8, 4], list(feature.EROSION_KERNEL)]
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_path = os.path.join(work_dir, '1_synthetic.png')
+            cv2.imwrite(file_path, synthetic.synthetic_ear(320, 240).image)
+
+            file, results = sweep.sweep_image((file_path, grid, None))
+            features      = feature.extract_features(file_path, 'otsu', None)
+
+        configs = sweep.configurations(grid)
+        self.assertEqual(file, '1_synthetic.png')
+        self.assertEqual(len(results), len(configs))
+
+        # The last configuration holds the current constants.
+        self.assertEqual(configs[-1]['block_size'], feature.BLOCK_SIZE)
+        self.assertEqual(results[-1], (features.count, features.avg_w_h_ratio))
+
+    def test_evaluate_ranks_by_error(self):
+        configs       = [{'block_size': 51}, {'block_size': 71}]
+        image_results = [
+            ('1_a.JPG', [(10, 1.0), (10, 1.0)]),
+            ('2_a.JPG', [(20, 1.4), (20, 1.0)]),
+            ('3_a.JPG', [(30, 1.2), (31, 1.0)]),
+            ('4_a.JPG', [(40, 0.9), (40, 1.0)]),
+        ]
+        total_counts  = {1: 100, 2: 200, 3: 300, 4: 400}
+
+        scores = sweep.evaluate(configs, image_results, total_counts)
+
+        self.assertEqual(scores[0].config, {'block_size': 51})
+        self.assertAlmostEqual(scores[0].mae, 0.0)
+        self.assertTrue(scores[1].mae > 0.0)
+
+    def test_evaluate_scores_common_ears(self):
+        configs       = [{'block_size': 51}, {'block_size': 71}]
+        image_results = [
+            ('1_a.JPG', [(10, 1.0), (10, 1.0)]),
+            ('2_a.JPG', [(20, 1.4), (20, 1.0)]),
+            ('3_a.JPG', [(30, 1.2), (31, 1.0)]),
+            ('4_a.JPG', [(40, 0.9), (40, 1.0)]),
+            ('5_a.JPG', [(50, 1.1), None]),
+        ]
+        total_counts  = {1: 100, 2: 200, 3: 300, 4: 400, 5: 500}
+
+        scores = {score.config['block_size']: score for score in sweep.evaluate(configs, image_results, total_counts)}
+
+        # The ear the second configuration failed on is left out of both scores.
+        self.assertEqual(scores[51].ears, 4)
+        self.assertEqual(scores[71].ears, 4)
+        self.assertEqual(scores[51].failures, 0)
+        self.assertEqual(scores[71].failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import sys
+import numpy as np
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import feature
+from corn_app import synthetic
+
+
+class TestTiling(unittest.TestCase):
+
+    def setUp(self):
+        self.image = synthetic.synthetic_ear(1200, 800).image
+
+    def test_tiled_mask_matches_whole_image(self):
+        whole = feature.mask_yellow(self.image)
+
+        # Tile sizes that do and do not divide the image evenly.
+        for tile_size in [97, 400]:
+            np.testing.assert_array_equal(feature.mask_yellow(self.image, tile_size=tile_size), whole)
+
+    def test_contours_are_stitched_across_seams(self):
+        masked = feature.mask_yellow(self.image)
+        whole  = feature.find_contours(masked.copy())
+        tiled  = feature.find_contours(masked.copy(), tile_size=97)
+
+        # Kernels crossing a seam still count once.
+        self.assertEqual(tiled.contour_count, whole.contour_count)
+        self.assertEqual(tiled.avg_w_h_ratio, whole.avg_w_h_ratio)
+        np.testing.assert_array_equal(tiled.image, whole.image)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import csv_features
+from corn_app import feature
+from corn_app import feature_store
+from corn_app import trainer
+
+
+class TestGenerateTrainingSet(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd      = os.getcwd()
+        self.work_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.work_dir.name)
+        os.makedirs('csv')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.work_dir.cleanup()
+
+    def write_csv(self, filename, delimiter, rows):
+        with open(filename, 'w') as csv_file:
+            for row in rows:
+                csv_file.write(delimiter.join(str(value) for value in row) + '\n')
+
+    def test_unsorted_photos_of_the_same_ear(self):
+        self.write_csv(csv_features.FILENAME, '|', [
+            csv_features.HEADER,
+            ['3_batch1.JPG', 90, 0.8],
+            ['1_batch1.JPG', 100, 0.9],
+            ['3_batch2.JPG', 95, 0.7],
+            ['7_batch1.JPG', 80, 0.6],
+            ['notes.JPG', 10, 0.5],
+        ])
+        self.write_csv(trainer.TOTAL_COUNTS_FILENAME, ',', [
+            ['ear', 'a', 'b', 'total'],
+            [3, 0, 0, 400],
+            [1, 0, 0, 500],
+            [2, 0, 0, 450],
+        ])
+
+        summary = trainer.generate_training_set('test')
+
+        self.assertEqual(summary.rows, 3)
+        self.assertEqual(summary.unmatched_ids, [7, 'notes.JPG'])
+        self.assertEqual(summary.missing_ids, [2])
+
+        with open('csv/test_dataset.csv', 'r') as data_file:
+            rows = [line.strip() for line in data_file]
+        self.assertEqual(rows, ['90,0.8,400', '100,0.9,500', '95,0.7,400'])
+
+    def test_feature_store(self):
+        with feature_store.FeatureStoreWriter() as store_writer:
+            store_writer.append(feature.Features('2_batch1.JPG', 120, 0.75))
+        with feature_store.FeatureStoreWriter(append=True) as store_writer:
+            store_writer.append(feature.Features('1_batch1.JPG', 100, 0.9, 0.1, 5300.0, 2.5, 0.8))
+
+        table = feature_store.load()
+        self.assertEqual(table.filenames, ['2_batch1.JPG', '1_batch1.JPG'])
+        self.assertEqual(table.columns['count'].tolist(), [120, 100])
+        self.assertEqual(table.columns['avg_w_h_ratio'].tolist(), [0.75, 0.9])
+        self.assertEqual(list(feature_store.iter_features(table))[1].to_list(),
+                         ['1_batch1.JPG', 100, 0.9, 0.1, 5300.0, 2.5, 0.8])
+
+        self.write_csv(trainer.TOTAL_COUNTS_FILENAME, ',', [
+            ['ear', 'a', 'b', 'total'],
+            [1, 0, 0, 500],
+            [2, 0, 0, 450],
+        ])
+
+        summary = trainer.generate_training_set('test')
+        x_data, y_data = trainer.load_dataset('test')
+
+        self.assertEqual(summary.rows, 2)
+        self.assertEqual(x_data.tolist(), [[120, 0.75], [100, 0.9]])
+        self.assertEqual(y_data.tolist(), [450, 500])
+
+        # A data set edited after it was generated is read from the csv file.
+        self.write_csv(trainer.DATASET_FILENAME.format(model_name='test'), ',', [[110, 0.8, 470]])
+        os.utime(trainer.DATASET_ARRAY_FILENAME.format(model_name='test'), (0, 0))
+        x_data, y_data = trainer.load_dataset('test')
+        self.assertEqual(x_data.tolist(), [[110, 0.8]])
+
+    def test_failed_run_keeps_the_feature_store(self):
+        with self.assertRaises(IOError):
+            feature_store.load()
+
+        with feature_store.FeatureStoreWriter() as store_writer:
+            store_writer.append(feature.Features('1_batch1.JPG', 100, 0.9))
+
+        with self.assertRaises(RuntimeError):
+            with feature_store.FeatureStoreWriter() as store_writer:
+                store_writer.append(feature.Features('2_batch1.JPG', 120, 0.75))
+                raise RuntimeError('photo could not be processed')
+
+        table = feature_store.load()
+        self.assertEqual(table.filenames, ['1_batch1.JPG'])
+        self.assertEqual(table.columns['count'].tolist(), [100])
+
+
+class TestIncrementalTraining(unittest.TestCase):
+
+    def setUp(self):
+        random      = np.random.RandomState(0)
+        self.x_data = np.column_stack([random.randint(80, 200, size=50), random.uniform(0.6, 1.2, size=50)])
+        self.y_data = 4.2 * self.x_data[:, 0] + 30 * self.x_data[:, 1] + random.normal(0, 10, size=50)
+
+    def test_folded_statistics_match_a_full_fit(self):
+        gram, moment = trainer.sufficient_statistics(self.x_data[:30], self.y_data[:30])
+        new_gram, new_moment = trainer.sufficient_statistics(self.x_data[30:], self.y_data[30:])
+
+        weight, basis           = trainer.solve_statistics(gram + new_gram, moment + new_moment)
+        full_weight, full_basis = trainer.least_squares(self.x_data, self.y_data)
+
+        np.testing.assert_allclose(weight, full_weight, rtol=1e-9)
+        np.testing.assert_allclose(basis, full_basis, rtol=1e-9)
+
+    def test_gradient_descent_converges_to_least_squares(self):
+        weight, basis           = trainer.gradient_descent(self.x_data, self.y_data)
+        full_weight, full_basis = trainer.least_squares(self.x_data, self.y_data)
+
+        np.testing.assert_allclose(weight, full_weight, rtol=1e-6)
+        np.testing.assert_allclose(basis, full_basis, rtol=1e-6)
+
+    def test_unseen_rows(self):
+        hashes = trainer.row_hashes(self.x_data, self.y_data)
+
+        # New rows may be anywhere in the data set.
+        unseen = trainer.unseen_rows(hashes, hashes[5:40])
+        self.assertEqual(np.flatnonzero(unseen).tolist(), list(range(5)) + list(range(40, 50)))
+
+        # A seen row that is gone cannot be folded out again.
+        self.assertIsNone(trainer.unseen_rows(hashes[1:], hashes))
+
+
+class TestCrossValidation(unittest.TestCase):
+
+    def test_folds_hold_out_every_row_once(self):
+        folds = trainer.fold_indices(23, 5)
+
+        self.assertEqual(len(folds), 5)
+        self.assertEqual(sorted(np.concatenate(folds).tolist()), list(range(23)))
+
+    def test_diverging_fit_is_scored_last(self):
+        random = np.random.RandomState(0)
+        x_data = np.column_stack([random.randint(80, 200, size=40), random.uniform(0.6, 1.2, size=40)])
+        y_data = 4.2 * x_data[:, 0] + 30 * x_data[:, 1]
+
+        mae, _ = trainer.fit_fold(('lstsq', {}, x_data[:30], y_data[:30], x_data[30:], y_data[30:]))
+        self.assertAlmostEqual(mae, 0.0, places=6)
+
+        mae, mape = trainer.fit_fold(('gradient', {'learning_rate': 10.0, 'iterations': 1000},
+                                      x_data[:30], y_data[:30], x_data[30:], y_data[30:]))
+        self.assertEqual((mae, mape), (float('inf'), float('inf')))
+
+    def test_a_single_fold_is_rejected(self):
+        # Checked before the data set is loaded, so no model is needed.
+        for folds in (0, 1):
+            with self.assertRaises(SystemExit):
+                trainer.cross_validate('missing_model', folds)
+
+
+if __name__ == '__main__':
+    unittest.main()
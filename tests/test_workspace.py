@@ -0,0 +1,37 @@
+import unittest
+import sys
+import numpy as np
+sys.path.append("..") #Add top level directory to python path for imports
+from corn_app import feature
+from corn_app import synthetic
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def test_buffers_are_reused_per_shape(self):
+        buffers = feature.Workspace(max_buffers=2)
+
+        first = buffers.buffer('gray', (40, 30))
+        self.assertIs(buffers.buffer('gray', (40, 30)), first)
+        self.assertIsNot(buffers.buffer('gray', (30, 40)), first)
+
+        # Going over the limit drops every buffer.
+        buffers.buffer('threshold', (40, 30))
+        self.assertIsNot(buffers.buffer('gray', (40, 30)), first)
+
+    def test_masks_do_not_share_memory(self):
+        first_image  = synthetic.synthetic_ear(320, 240, seed=0).image
+        second_image = synthetic.synthetic_ear(320, 240, seed=1).image
+
+        first    = feature.mask_yellow(first_image)
+        expected = first.copy()
+        second   = feature.mask_yellow(second_image)
+
+        # Masked images are handed on to later stages, so masking the next
+        # photo must not overwrite them.
+        self.assertFalse(np.shares_memory(first, second))
+        np.testing.assert_array_equal(first, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()